@@ -1,9 +1,16 @@
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib
 from sklearn.ensemble import IsolationForest
 from io import StringIO
 
+# `python deviation.py out.png` renders headlessly for batch reports
+OUT = sys.argv[1] if len(sys.argv) > 1 else None
+if OUT:
+    matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
 # ---------- Load & prepare data ----------
 with open('temp_reading.csv', 'r', encoding='utf-8') as f:
     lines = [ln for ln in f if ln.strip() and not ln.lstrip().startswith('#')]
@@ -18,18 +25,15 @@ model = IsolationForest(contamination=0.01, random_state=42)
 model.fit(quiet_df[['temperature_C']])
 
 # ---------- Masking logic (privacy + utility guardrails) ----------
-masked = []
-anom_flags = []
-for temp in df['temperature_C']:
-    is_anom = (model.predict(pd.DataFrame([[temp]], columns=['temperature_C']))[0] == -1)
-    anom_flags.append(is_anom)
-    if temp >= 30.0:
-        out = temp                                 # don't mask overheating
-    elif is_anom:
-        out = 25.0 + np.random.normal(0, 0.1)      # hide door-dip pattern
-    else:
-        out = temp + np.random.normal(0, 0.02)     # gentle noise on normal data
-    masked.append(out)
+# One vectorized predict for the whole trace instead of one per row
+temps = df['temperature_C'].to_numpy()
+anom_flags = model.predict(df[['temperature_C']]) == -1
+masked = np.where(
+    temps >= 30.0, temps,                                  # don't mask overheating
+    np.where(anom_flags,
+             25.0 + np.random.normal(0, 0.1, len(temps)),  # hide door-dip pattern
+             temps + np.random.normal(0, 0.02, len(temps))  # gentle noise on normal data
+             ))
 
 df['masked'] = masked
 df['is_anom'] = anom_flags
@@ -79,4 +83,7 @@ ax2.set_title('Masking Error Over Time with ±1σ Band')
 ax2.legend(loc='best')
 
 plt.tight_layout()
-plt.show()
+if OUT:
+    plt.savefig(OUT)
+else:
+    plt.show()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""Per-reading cost of the masking step.
+
+    python benchmarks/bench_masking.py [n_readings]
+
+Compares the original per-message global-RNG draw with the pooled
+`MaskingPolicy` on single readings and on whole arrays.
+"""
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from masking import MaskingPolicy, PrivacyBudget, worker_rng  # noqa: E402
+
+
+def legacy_mask(temp, is_anomaly):
+    # The masking branch formerly inlined in stream_processor.on_message
+    if temp >= 30.0 or temp <= 21.0:
+        return temp
+    if is_anomaly:
+        return 25.0 + np.random.normal(0, 0.1)
+    return temp + np.random.normal(0, 0.02)
+
+
+def bench(label, fn, n, repeat=5):
+    best = min(timeit.repeat(fn, number=1, repeat=repeat))
+    print(f"{label:<38} {best / n * 1e9:9.1f} ns/reading")
+
+
+def main(n=100_000):
+    rng = np.random.default_rng(0)
+    temps = 25.0 + rng.normal(0, 0.5, n)
+    anomalies = rng.random(n) < 0.05
+    pairs = list(zip(temps.tolist(), anomalies.tolist()))
+
+    policy = MaskingPolicy.default(worker_rng(0))
+    budgeted = MaskingPolicy.default(worker_rng(0))
+    budgeted.budget = PrivacyBudget(epsilon=float('inf'))
+
+    print(f"{n} readings, {anomalies.mean():.0%} anomalies")
+    bench('legacy np.random.normal per message', lambda: [legacy_mask(t, a) for t, a in pairs], n)
+    bench('policy.apply_one (pooled)', lambda: [policy.apply_one(t, a) for t, a in pairs], n)
+    bench('policy.apply_one + budget', lambda: [budgeted.apply_one(t, a) for t, a in pairs], n)
+    bench('policy.apply (array)', lambda: policy.apply(temps, anomalies), n)
+    bench('policy.apply + budget (array)', lambda: budgeted.apply(temps, anomalies), n)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""Visually lossless downsampling for long temperature traces.
+
+`minmax_indices` keeps the lowest and highest point of every fixed-size
+bucket, so no dip or spike disappears; it composes across chunks, which
+makes it the first stage for streamed data. `lttb_indices` (Largest
+Triangle Three Buckets) then picks the points that best preserve the
+shape of the line for a fixed output budget.
+"""
+import numpy as np
+
+
+def minmax_indices(y, bucket):
+    """Sorted indices of the min and max of each `bucket`-row slice of y."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= 2 or bucket <= 2:
+        return np.arange(n)
+    n_full = n // bucket * bucket
+    idx = []
+    if n_full:
+        rows = y[:n_full].reshape(-1, bucket)
+        base = np.arange(0, n_full, bucket)
+        idx += [base + rows.argmin(axis=1), base + rows.argmax(axis=1)]
+    if n_full < n:
+        tail = y[n_full:]
+        idx.append(n_full + np.array([tail.argmin(), tail.argmax()]))
+    return np.unique(np.concatenate(idx))
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of the `n_out` points LTTB keeps; always includes both ends."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    # Bucket edges over the interior points; first and last are fixed
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point) is the third vertex
+        nlo, nhi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        keep[i + 1] = a
+    return keep
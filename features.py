@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Rolling per-sensor features for anomaly scoring.
+
+`RollingFeatures` keeps a ring buffer of the last `window` readings of one
+sensor and maintains running sums, so each new reading costs O(1):
+
+    temperature_C, roll_mean, roll_std, slope, ewma
+
+`rolling_features` computes exactly the same columns offline in vectorized
+form; train_model.py uses it so that training and serving features match.
+Slope is in °C per reading, std is the population std of the window, and
+windows are partial (shorter) until `window` readings have been seen.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+FEATURE_NAMES  = ['temperature_C', 'roll_mean', 'roll_std', 'slope', 'ewma']
+WINDOW         = 10
+EWMA_ALPHA     = 0.3
+DEFAULT_SENSOR = 'default'
+CHUNK_ROWS     = 65536
+
+
+def _stats(n, s, ss, sxy):
+    """Mean, std and least-squares slope from window sums."""
+    mean = s / n
+    std = np.sqrt(np.maximum(ss / n - mean * mean, 0.0))
+    sx = n * (n - 1) / 2.0
+    denom = n * (n - 1) * (2 * n - 1) / 6.0 * n - sx * sx
+    slope = np.where(denom > 0, (n * sxy - sx * s) / np.where(denom > 0, denom, 1.0), 0.0)
+    return mean, std, slope
+
+
+def _ewma(values, alpha, seed=None):
+    """Recursive EWMA (adjust=False); continues from `seed` when given."""
+    if seed is None:
+        return pd.Series(values).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    series = pd.Series(np.concatenate(([seed], values)))
+    return series.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def rolling_features(values, window=WINDOW, alpha=EWMA_ALPHA, history=None, ewma=None):
+    """Vectorized feature matrix (n, len(FEATURE_NAMES)) for a series.
+
+    `history` (oldest first, at most window - 1 values) and the previous
+    `ewma` continue a series that was already partly consumed.
+    """
+    values = np.asarray(values, dtype=float)
+    history = np.asarray(history if history is not None else [], dtype=float)
+    history = history[len(history) - (window - 1):] if len(history) >= window else history
+    full = np.concatenate((history, values))
+    k = len(history)
+    out = np.empty((len(values), len(FEATURE_NAMES)))
+    out[:, 0] = values
+    out[:, 4] = _ewma(values, alpha, ewma)
+
+    # Leading rows see a partial window
+    n_partial = min(max(window - 1 - k, 0), len(values))
+    for i in range(n_partial):
+        w = full[:k + i + 1]
+        n = len(w)
+        mean, std, slope = _stats(n, w.sum(), (w * w).sum(), (np.arange(n) * w).sum())
+        out[i, 1:4] = mean, std, slope
+
+    # Full windows, a chunk at a time to bound the temporaries
+    x = np.arange(window)
+    for start in range(n_partial, len(values), CHUNK_ROWS):
+        stop = min(start + CHUNK_ROWS, len(values))
+        lo = k + start - window + 1
+        views = np.lib.stride_tricks.sliding_window_view(full[lo:k + stop], window)
+        mean, std, slope = _stats(window, views.sum(axis=1), (views * views).sum(axis=1), views @ x)
+        out[start:stop, 1] = mean
+        out[start:stop, 2] = std
+        out[start:stop, 3] = slope
+    return out
+
+
+class RollingFeatures:
+    """Incremental features over the last `window` readings of one sensor."""
+
+    def __init__(self, window=WINDOW, alpha=EWMA_ALPHA):
+        self.window = window
+        self.alpha = alpha
+        self.buf = np.zeros(window)
+        self.count = 0     # readings in the window (<= window)
+        self.pos = 0       # next slot to overwrite
+        self.s = 0.0       # sum y
+        self.ss = 0.0      # sum y^2
+        self.sxy = 0.0     # sum i * y, i = 0 for the oldest reading
+        self.ewma = None
+
+    def history(self):
+        """Window contents, oldest first."""
+        if self.count < self.window:
+            return self.buf[:self.count].copy()
+        return np.roll(self.buf, -self.pos)
+
+    def _resum(self):
+        # Exact sums from the buffer; bounds floating-point drift
+        h = self.history()
+        self.s = h.sum()
+        self.ss = (h * h).sum()
+        self.sxy = (np.arange(len(h)) * h).sum()
+
+    def update(self, y):
+        y = float(y)
+        if self.count < self.window:
+            self.sxy += self.count * y
+            self.count += 1
+            self.s += y
+            self.ss += y * y
+        else:
+            old = self.buf[self.pos]
+            self.sxy += (self.window - 1) * y - (self.s - old)
+            self.s += y - old
+            self.ss += y * y - old * old
+        self.buf[self.pos] = y
+        self.pos += 1
+        if self.pos == self.window:
+            self.pos = 0
+            self._resum()
+
+        self.ewma = y if self.ewma is None else self.alpha * y + (1 - self.alpha) * self.ewma
+
+        # Scalar form of _stats; numpy call overhead dominates at this size
+        n = self.count
+        mean = self.s / n
+        std = math.sqrt(max(self.ss / n - mean * mean, 0.0))
+        sx = n * (n - 1) / 2.0
+        denom = n * (n - 1) * (2 * n - 1) / 6.0 * n - sx * sx
+        slope = (n * self.sxy - sx * self.s) / denom if denom > 0 else 0.0
+        return np.array([y, mean, std, slope, self.ewma])
+
+    def update_batch(self, values):
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return np.empty((0, len(FEATURE_NAMES)))
+        out = rolling_features(values, self.window, self.alpha, self.history(), self.ewma)
+        self.load(np.concatenate((self.history(), values)), out[-1, 4])
+        return out
+
+    def load(self, history, ewma):
+        """Reset to a window of past readings (oldest first) and an EWMA."""
+        tail = np.asarray(history, dtype=float)[-self.window:]
+        self.count = len(tail)
+        self.buf[:] = 0.0
+        self.buf[:self.count] = tail
+        self.pos = self.count % self.window
+        self.ewma = ewma
+        self._resum()
+
+
+class FeatureEngine:
+    """One RollingFeatures per sensor, created on first sight."""
+
+    def __init__(self, window=WINDOW, alpha=EWMA_ALPHA):
+        self.window = window
+        self.alpha = alpha
+        self.sensors = {}
+
+    def sensor(self, sensor_id):
+        if sensor_id not in self.sensors:
+            self.sensors[sensor_id] = RollingFeatures(self.window, self.alpha)
+        return self.sensors[sensor_id]
+
+    def update(self, sensor_id, temp):
+        return self.sensor(sensor_id).update(temp)
+
+    def update_batch(self, sensor_id, temps):
+        return self.sensor(sensor_id).update_batch(temps)
+
+
+def engine_for(model):
+    """FeatureEngine matching a model trained on rolling features, else None."""
+    params = getattr(model, 'rolling_params_', None)
+    if getattr(model, 'n_features_in_', 1) <= 1 or params is None:
+        return None
+    return FeatureEngine(**params)
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Synthetic fleet traces with ground-truth labels.
+
+    python generate_fleet.py generate out/ --sensors 2000 --hours 6 --rate 1
+    python generate_fleet.py evaluate --sensors 2000 --hours 1 --model iforest.joblib
+    python generate_fleet.py publish --sensors 50 --hours 0.1 --transport mqtt
+
+Every sensor gets its own baseline and noise, plus randomly placed
+door-open dips, overheat ramps, undercool ramps, dropouts (missing rows)
+and a constant clock offset with a small drift. Readings are generated
+time-chunk by time-chunk as (sensors x steps) NumPy matrices, so memory
+is bounded by --chunk-secs rather than the trace length.
+
+`generate` writes ``chunk-NNNNN.csv`` files in the dump layout
+(sensor_id,timestamp,temperature_C,label) that ``train_fleet.py partition``
+accepts, plus ``sensors.csv`` with each sensor's baseline and clock skew.
+`evaluate` streams the same readings through `Processor.process_batch` and
+reports throughput and precision/recall of the anomaly flag. `publish`
+sends them to the processor's raw topic.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+LABELS      = np.array(['normal', 'door_open', 'overheat', 'undercool'])
+NORMAL, DOOR_OPEN, OVERHEAT, UNDERCOOL = range(4)
+CHUNK_SECS  = 600
+DOOR_TAU    = 5.0     # seconds for a dip to settle toward its depth
+NOISE_STEPS = 256     # steps per independently seeded block of sensor noise
+
+
+class FleetScenario:
+    """Reproducible fleet trace; iterate it with `chunks`.
+
+    Event rates are per sensor per hour; durations are (min, max) seconds
+    and magnitudes (min, max) °C, drawn uniformly per event.
+    """
+
+    def __init__(self, n_sensors=1000, hours=1.0, rate_hz=1.0, start='2025-07-01T00:00:00Z', seed=0,
+                 noise=0.05, baseline_spread=0.3,
+                 door_per_hour=0.5, door_secs=(20, 120), door_depth=(1.5, 4.0),
+                 overheat_per_hour=0.05, overheat_secs=(60, 600), overheat_rise=(6.0, 9.0),
+                 undercool_per_hour=0.05, undercool_secs=(60, 600), undercool_drop=(4.5, 7.0),
+                 dropout_per_hour=0.1, dropout_secs=(5, 60), max_skew_secs=2.0, max_drift_ppm=50.0):
+        self.seed = seed if seed is not None else np.random.SeedSequence().entropy
+        self.rng = np.random.default_rng(self.seed)
+        self.n_sensors = n_sensors
+        self.rate_hz = rate_hz
+        self.n_steps = int(hours * 3600 * rate_hz)
+        self.start = np.datetime64(pd.Timestamp(start).tz_convert(None).to_datetime64(), 'ns')
+        self.noise = noise
+
+        self.sensor_ids = np.array([f"sensor-{i:05d}" for i in range(n_sensors)])
+        self.baseline = 25.0 + self.rng.normal(0, baseline_spread, n_sensors)
+        self.skew_secs = self.rng.uniform(-max_skew_secs, max_skew_secs, n_sensors)
+        self.drift_ppm = self.rng.uniform(-max_drift_ppm, max_drift_ppm, n_sensors)
+
+        self.events = {
+            DOOR_OPEN: self._events(door_per_hour, door_secs, door_depth, hours),
+            OVERHEAT:  self._events(overheat_per_hour, overheat_secs, overheat_rise, hours),
+            UNDERCOOL: self._events(undercool_per_hour, undercool_secs, undercool_drop, hours),
+        }
+        self.dropouts = self._events(dropout_per_hour, dropout_secs, (0, 0), hours)
+
+    def _events(self, per_hour, secs, magnitude, hours):
+        counts = self.rng.poisson(per_hour * hours, self.n_sensors)
+        total = int(counts.sum())
+        return {
+            'sensor': np.repeat(np.arange(self.n_sensors), counts),
+            'start': self.rng.integers(0, max(self.n_steps, 1), total),
+            'length': np.maximum((self.rng.uniform(*secs, total) * self.rate_hz).astype(int), 1),
+            'magnitude': self.rng.uniform(*magnitude, total),
+        }
+
+    @staticmethod
+    def _expand(ev, s0, s1):
+        """Flatten the event rows falling in steps [s0, s1) into per-row arrays."""
+        lo = np.maximum(ev['start'], s0)
+        hi = np.minimum(ev['start'] + ev['length'], s1)
+        live = hi > lo
+        lo, hi = lo[live], hi[live]
+        counts = hi - lo
+        first = np.cumsum(counts) - counts
+        offs = np.arange(counts.sum()) - np.repeat(first, counts)
+        step = np.repeat(lo, counts) + offs
+        return {
+            'sensor': np.repeat(ev['sensor'][live], counts),
+            'col': step - s0,
+            'rel': step - np.repeat(ev['start'][live], counts),
+            'length': np.repeat(ev['length'][live], counts),
+            'magnitude': np.repeat(ev['magnitude'][live], counts),
+        }
+
+    def _noise(self, s0, s1):
+        """Sensor noise for steps [s0, s1).
+
+        Each NOISE_STEPS block of steps draws from its own ``[seed, block]``
+        stream, so the values don't depend on chunking or on how many
+        times the scenario has been read.
+        """
+        b0, b1 = s0 // NOISE_STEPS, (s1 - 1) // NOISE_STEPS + 1
+        blocks = [np.random.default_rng([self.seed, b]).normal(0, self.noise, (self.n_sensors, NOISE_STEPS))
+                  for b in range(b0, b1)]
+        offset = b0 * NOISE_STEPS
+        return np.hstack(blocks)[:, s0 - offset:s1 - offset]
+
+    def chunk(self, s0, s1):
+        """Readings for steps [s0, s1), time-major, dropouts removed."""
+        n, m = self.n_sensors, s1 - s0
+        steps = np.arange(s0, s1)
+        temps = self.baseline[:, None] + self._noise(s0, s1)
+        labels = np.zeros((n, m), dtype=np.int8)
+
+        for kind, ev in self.events.items():
+            rows = self._expand(ev, s0, s1)
+            if kind == DOOR_OPEN:
+                offset = -rows['magnitude'] * (1 - np.exp(-rows['rel'] / (DOOR_TAU * self.rate_hz)))
+            elif kind == OVERHEAT:
+                offset = rows['magnitude'] * (rows['rel'] + 1) / rows['length']
+            else:
+                offset = -rows['magnitude'] * (rows['rel'] + 1) / rows['length']
+            np.add.at(temps, (rows['sensor'], rows['col']), offset)
+            labels[rows['sensor'], rows['col']] = kind
+
+        present = np.ones((n, m), dtype=bool)
+        rows = self._expand(self.dropouts, s0, s1)
+        present[rows['sensor'], rows['col']] = False
+
+        # Sensor clocks: constant offset plus drift, in ns
+        true_ns = (steps * (1e9 / self.rate_hz)).astype(np.int64)
+        skew_ns = (self.skew_secs[:, None] * 1e9 + true_ns[None, :] * self.drift_ppm[:, None] * 1e-6).astype(np.int64)
+        stamps = self.start + (true_ns[None, :] + skew_ns).astype('timedelta64[ns]')
+
+        # Time-major order, like arrival at the broker
+        keep = present.T
+        sensor = np.broadcast_to(np.arange(n)[None, :], (m, n))[keep]
+        return {
+            'sensor': sensor,
+            'timestamp': stamps.T[keep],
+            'temperature_C': np.round(temps.T[keep], 2),
+            'label': labels.T[keep],
+        }
+
+    def chunks(self, chunk_secs=CHUNK_SECS):
+        step = max(int(chunk_secs * self.rate_hz), 1)
+        for s0 in range(0, self.n_steps, step):
+            yield self.chunk(s0, min(s0 + step, self.n_steps))
+
+
+def iso(stamps):
+    return np.char.add(np.datetime_as_string(stamps.astype('datetime64[ms]'), unit='ms'), 'Z')
+
+
+def to_frame(scenario, chunk):
+    return pd.DataFrame({
+        'sensor_id': scenario.sensor_ids[chunk['sensor']],
+        'timestamp': iso(chunk['timestamp']),
+        'temperature_C': chunk['temperature_C'],
+        'label': LABELS[chunk['label']],
+    })
+
+
+# ─── Commands ──────────────────────────────────────────────────────────
+def generate(scenario, out_dir, chunk_secs=CHUNK_SECS, log=print):
+    os.makedirs(out_dir, exist_ok=True)
+    pd.DataFrame({
+        'sensor_id': scenario.sensor_ids,
+        'baseline_C': scenario.baseline,
+        'skew_secs': scenario.skew_secs,
+        'drift_ppm': scenario.drift_ppm,
+    }).to_csv(os.path.join(out_dir, 'sensors.csv'), index=False)
+
+    total, t0 = 0, time.perf_counter()
+    for i, chunk in enumerate(scenario.chunks(chunk_secs)):
+        to_frame(scenario, chunk).to_csv(os.path.join(out_dir, f"chunk-{i:05d}.csv"), index=False)
+        total += len(chunk['sensor'])
+    log(f"[Generate] {total} readings for {scenario.n_sensors} sensors in "
+        f"{time.perf_counter() - t0:.1f}s → {out_dir}")
+    return total
+
+
+def evaluate(scenario, processor, chunk_secs=CHUNK_SECS):
+    """Throughput and anomaly-flag precision/recall against the labels.
+
+    Positives are all non-normal readings; `by_label` gives the share of
+    each label that was flagged.
+    """
+    flagged = np.zeros(len(LABELS), dtype=np.int64)
+    seen = np.zeros(len(LABELS), dtype=np.int64)
+    # A single shared model needs no per-sensor state: score whole chunks
+    per_sensor = processor.features is not None or processor.models is not None
+    busy = 0.0
+
+    for chunk in scenario.chunks(chunk_secs):
+        temps, labels = chunk['temperature_C'], chunk['label']
+        t0 = time.perf_counter()
+        if per_sensor:
+            anomalies = np.zeros(len(temps), dtype=bool)
+            order = np.argsort(chunk['sensor'], kind='stable')
+            sensors, starts = np.unique(chunk['sensor'][order], return_index=True)
+            for s, lo, hi in zip(sensors, starts, np.append(starts[1:], len(order))):
+                idx = order[lo:hi]
+                _, anomalies[idx] = processor.process_batch(temps[idx], sensor_id=scenario.sensor_ids[s])
+        else:
+            _, anomalies = processor.process_batch(temps)
+        busy += time.perf_counter() - t0
+        seen += np.bincount(labels, minlength=len(LABELS))
+        flagged += np.bincount(labels[anomalies], minlength=len(LABELS))
+
+    tp = int(flagged[1:].sum())
+    fp = int(flagged[NORMAL])
+    fn = int(seen[1:].sum()) - tp
+    total = int(seen.sum())
+    return {
+        'readings': total,
+        'seconds': busy,
+        'readings_per_sec': total / busy if busy else float('nan'),
+        'precision': tp / (tp + fp) if tp + fp else float('nan'),
+        'recall': tp / (tp + fn) if tp + fn else float('nan'),
+        'by_label': {str(LABELS[k]): (flagged[k] / seen[k] if seen[k] else float('nan')) for k in range(len(LABELS))},
+    }
+
+
+def publish(scenario, transport, topic, chunk_secs=CHUNK_SECS, rate=None, log=print):
+    """Send readings to `topic`; `rate` (messages/s) throttles, None is flat out."""
+    sent, t0 = 0, time.perf_counter()
+    for chunk in scenario.chunks(chunk_secs):
+        frame = to_frame(scenario, chunk).drop(columns='label')
+        for msg in frame.to_dict('records'):
+            transport.publish(topic, msg)
+            sent += 1
+            if rate:
+                ahead = sent / rate - (time.perf_counter() - t0)
+                if ahead > 0:
+                    time.sleep(ahead)
+    log(f"[Generate] published {sent} readings to {topic} in {time.perf_counter() - t0:.1f}s")
+    return sent
+
+
+def load_processor(model_path, manifest=None):
+    import joblib
+    from features import engine_for
+    from registry import ModelRegistry
+    from thermal_core import Processor
+
+    model = joblib.load(model_path)
+    registry = ModelRegistry(manifest) if manifest else None
+    features = registry.feature_engine() if registry is not None else None
+    return Processor(model, features=features or engine_for(model), models=registry)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--sensors', type=int, default=1000)
+    common.add_argument('--hours', type=float, default=1.0)
+    common.add_argument('--rate', type=float, default=1.0, help='readings per second per sensor')
+    common.add_argument('--seed', type=int, default=0)
+    common.add_argument('--door-per-hour', type=float, default=0.5)
+    common.add_argument('--overheat-per-hour', type=float, default=0.05)
+    common.add_argument('--undercool-per-hour', type=float, default=0.05)
+    common.add_argument('--dropout-per-hour', type=float, default=0.1)
+    common.add_argument('--max-skew-secs', type=float, default=2.0)
+    common.add_argument('--chunk-secs', type=float, default=CHUNK_SECS)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    g = sub.add_parser('generate', parents=[common], help='write chunked CSV files')
+    g.add_argument('out_dir')
+
+    e = sub.add_parser('evaluate', parents=[common], help='throughput and precision/recall')
+    e.add_argument('--model', default='iforest.joblib')
+    e.add_argument('--manifest', help='per-sensor models from train_fleet.py')
+
+    p = sub.add_parser('publish', parents=[common], help='send readings to the raw topic')
+    p.add_argument('--transport', choices=['mqtt', 'shm'], default='mqtt')
+    p.add_argument('--broker', default=os.getenv('MQTT_BROKER', 'localhost'))
+    p.add_argument('--port', type=int, default=int(os.getenv('MQTT_PORT', '1883')))
+    p.add_argument('--topic', default=os.getenv('MQTT_PUB_TOPIC', 'dc/temperature/raw_encrypted'))
+    p.add_argument('--key-file', default=os.getenv('FERNET_KEY_FILE', 'secret.key'))
+    p.add_argument('--msg-rate', type=float, help='messages per second (default: unthrottled)')
+
+    args = parser.parse_args(argv)
+    scenario = FleetScenario(
+        n_sensors=args.sensors, hours=args.hours, rate_hz=args.rate, seed=args.seed,
+        door_per_hour=args.door_per_hour, overheat_per_hour=args.overheat_per_hour,
+        undercool_per_hour=args.undercool_per_hour, dropout_per_hour=args.dropout_per_hour,
+        max_skew_secs=args.max_skew_secs)
+
+    if args.command == 'generate':
+        generate(scenario, args.out_dir, args.chunk_secs)
+    elif args.command == 'evaluate':
+        result = evaluate(scenario, load_processor(args.model, args.manifest), args.chunk_secs)
+        print(f"[Evaluate] {result['readings']} readings in {result['seconds']:.2f}s "
+              f"({result['readings_per_sec']:,.0f}/s)")
+        print(f"[Evaluate] precision {result['precision']:.3f}  recall {result['recall']:.3f}")
+        for label, rate in result['by_label'].items():
+            print(f"[Evaluate]   flagged {label:<10} {rate:.3f}")
+    else:
+        from transport import make_transport
+        cipher = None
+        if args.transport == 'mqtt':
+            from cryptography.fernet import Fernet
+            cipher = Fernet(open(args.key_file, 'rb').read())
+        transport = make_transport(args.transport, broker=args.broker, port=args.port,
+                                   cipher=cipher, name='Generator')
+        transport.start()
+        try:
+            publish(scenario, transport, args.topic, args.chunk_secs, rate=args.msg_rate)
+        finally:
+            transport.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""Privacy masking mechanisms for the stream processor.
+
+A `MaskingPolicy` decides per reading what leaves the processor:
+
+* overheat / undercool readings pass through untouched (HVAC safety),
+* anomalies (door dips) are replaced by `ConstantSubstitution`,
+* everything else goes through the `normal` mechanism (Gaussian jitter by
+  default, or `LaplaceMechanism`),
+* with a `PrivacyBudget`, a sensor that has spent its epsilon gets the
+  substitution instead of a noised real value until the budget resets.
+
+Noise comes from `NoisePool`s: standard draws generated in blocks from a
+per-worker `numpy.random.Generator` (see `worker_rng`), so reproducible
+streams don't collide across processes and a single reading costs a slice
+of a pre-drawn block rather than a global-RNG call.
+"""
+import math
+import time
+
+import numpy as np
+
+from features import DEFAULT_SENSOR
+
+NOISE_BLOCK    = 8192
+MASK_CENTER    = 25.0
+ANOMALY_SIGMA  = 0.1
+NORMAL_SIGMA   = 0.02
+SENSITIVITY    = 0.1     # largest change one reading makes to a released value (°C)
+DELTA          = 1e-5    # Gaussian (epsilon, delta)-DP failure probability
+OVERHEAT_TEMP  = 30.0
+UNDERCOOL_TEMP = 21.0
+BUDGET_TOL     = 1e-9    # relative slack so summed and divided float costs agree
+
+
+def worker_rng(seed=None, worker_id=0):
+    """Independent, reproducible Generator for one worker of a pool."""
+    return np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(worker_id,))))
+
+
+class NoisePool:
+    """Standard noise drawn from `rng` in blocks of `block` values."""
+
+    def __init__(self, rng, kind='normal', block=NOISE_BLOCK):
+        self.rng = rng
+        self.kind = kind
+        self.block = block
+        self.buf = np.empty(0)
+        self.items = []    # the same block as Python floats, for `next`
+        self.pos = 0
+
+    def _refill(self):
+        self.buf = self._draw(self.block)
+        self.items = None
+        self.pos = 0
+
+    def _draw(self, size):
+        if self.kind == 'normal':
+            return self.rng.standard_normal(size)
+        if self.kind == 'laplace':
+            return self.rng.laplace(0.0, 1.0, size)
+        raise ValueError(f"Unknown noise kind: {self.kind!r}")
+
+    def take(self, n):
+        """Next `n` draws as an array."""
+        if n > self.block:
+            return self._draw(n)
+        if self.pos + n > len(self.buf):
+            self._refill()
+        out = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return out
+
+    def next(self):
+        if self.pos >= len(self.buf):
+            self._refill()
+        if self.items is None:
+            self.items = self.buf.tolist()
+        self.pos += 1
+        return self.items[self.pos - 1]
+
+
+# ─── Mechanisms ────────────────────────────────────────────────────────
+class GaussianMechanism:
+    """value + N(0, sigma²); epsilon per release for (epsilon, delta)-DP."""
+
+    def __init__(self, rng, sigma=NORMAL_SIGMA, sensitivity=SENSITIVITY, delta=DELTA, block=NOISE_BLOCK):
+        self.sigma = sigma
+        self.pool = NoisePool(rng, 'normal', block)
+        self.epsilon = sensitivity * math.sqrt(2 * math.log(1.25 / delta)) / sigma
+
+    def apply(self, values):
+        return values + self.sigma * self.pool.take(len(values))
+
+    def apply_one(self, value):
+        return value + self.sigma * self.pool.next()
+
+
+class LaplaceMechanism:
+    """value + Laplace(0, scale); epsilon = sensitivity / scale."""
+
+    def __init__(self, rng, scale=NORMAL_SIGMA, sensitivity=SENSITIVITY, block=NOISE_BLOCK):
+        self.scale = scale
+        self.pool = NoisePool(rng, 'laplace', block)
+        self.epsilon = sensitivity / scale
+
+    def apply(self, values):
+        return values + self.scale * self.pool.take(len(values))
+
+    def apply_one(self, value):
+        return value + self.scale * self.pool.next()
+
+
+class ConstantSubstitution:
+    """Replace the value by center + N(0, sigma²), clamped to [low, high].
+
+    The output does not depend on the input, so it spends no budget.
+    """
+
+    epsilon = 0.0
+
+    def __init__(self, rng, center=MASK_CENTER, sigma=ANOMALY_SIGMA, low=None, high=None, block=NOISE_BLOCK):
+        self.center = center
+        self.sigma = sigma
+        self.low = -np.inf if low is None else low
+        self.high = np.inf if high is None else high
+        self.pool = NoisePool(rng, 'normal', block)
+
+    def apply(self, values):
+        out = self.center + self.sigma * self.pool.take(len(values))
+        return np.clip(out, self.low, self.high)
+
+    def apply_one(self, value):
+        return min(max(self.center + self.sigma * self.pool.next(), self.low), self.high)
+
+
+class PrivacyBudget:
+    """Per-sensor epsilon accounting, optionally renewed every `period` seconds.
+
+    A release is allowed while the spent total stays within epsilon (up to
+    BUDGET_TOL), the same rule for `charge` and `charge_one`.
+    """
+
+    def __init__(self, epsilon, period=None, clock=time.monotonic):
+        self.epsilon = epsilon
+        self.period = period
+        self.clock = clock
+        self.spent = {}
+        self.window_start = clock()
+
+    def _maybe_renew(self):
+        if self.period is not None and self.clock() - self.window_start >= self.period:
+            self.spent.clear()
+            self.window_start = self.clock()
+
+    def window_epoch(self):
+        """Wall-clock start of the current window, as epoch seconds."""
+        return time.time() - (self.clock() - self.window_start)
+
+    def resume(self, spent, window_epoch):
+        """Carry over `spent` from an earlier process whose window began at `window_epoch`.
+
+        Time spent down counts towards the period, so a window that ended
+        meanwhile renews right away.
+        """
+        self.spent.update(spent)
+        self.window_start = self.clock() - (time.time() - window_epoch)
+        self._maybe_renew()
+
+    def remaining(self, sensor_id):
+        self._maybe_renew()
+        return self.epsilon - self.spent.get(sensor_id, 0.0)
+
+    def charge(self, sensor_id, cost, n=1):
+        """Spend up to `n` releases of `cost`; returns how many were allowed."""
+        if cost <= 0:
+            return n
+        remaining = self.remaining(sensor_id)
+        if math.isinf(remaining):
+            allowed = n
+        else:
+            allowed = max(0, min(n, int((remaining + self.epsilon * BUDGET_TOL) // cost)))
+        self.spent[sensor_id] = self.spent.get(sensor_id, 0.0) + allowed * cost
+        return allowed
+
+    def charge_one(self, sensor_id, cost):
+        """Scalar `charge`: True if one release of `cost` fits."""
+        if self.period is not None:
+            self._maybe_renew()
+        spent = self.spent.get(sensor_id, 0.0) + cost
+        if spent > self.epsilon * (1 + BUDGET_TOL):
+            return False
+        self.spent[sensor_id] = spent
+        return True
+
+
+# ─── Policy ────────────────────────────────────────────────────────────
+class MaskingPolicy:
+    def __init__(self, normal, anomaly, overheat=OVERHEAT_TEMP, undercool=UNDERCOOL_TEMP, budget=None):
+        self.normal = normal
+        self.anomaly = anomaly
+        self.overheat = overheat
+        self.undercool = undercool
+        self.budget = budget
+
+    @classmethod
+    def default(cls, rng=None, overheat=OVERHEAT_TEMP, undercool=UNDERCOOL_TEMP):
+        """The processor's original policy: 25 ± 0.1 for anomalies, ± 0.02 otherwise."""
+        rng = rng if rng is not None else worker_rng()
+        return cls(GaussianMechanism(rng, NORMAL_SIGMA), ConstantSubstitution(rng, MASK_CENTER, ANOMALY_SIGMA),
+                   overheat=overheat, undercool=undercool)
+
+    def apply(self, temps, anomalies, sensor_id=DEFAULT_SENSOR):
+        """Masked copy of `temps` for one sensor's readings."""
+        temps = np.asarray(temps, dtype=float)
+        anomalies = np.asarray(anomalies, dtype=bool)
+        passthrough = (temps >= self.overheat) | (temps <= self.undercool)
+        substitute = anomalies & ~passthrough
+        noised = ~(anomalies | passthrough)
+
+        if self.budget is not None and noised.any():
+            idx = np.flatnonzero(noised)
+            allowed = self.budget.charge(sensor_id, self.normal.epsilon, len(idx))
+            noised[idx[allowed:]] = False
+            substitute[idx[allowed:]] = True
+
+        out = temps.copy()
+        if substitute.any():
+            out[substitute] = self.anomaly.apply(temps[substitute])
+        if noised.any():
+            out[noised] = self.normal.apply(temps[noised])
+        return out
+
+    def apply_one(self, temp, is_anomaly, sensor_id=DEFAULT_SENSOR):
+        """Scalar fast path of `apply` for per-message use."""
+        if temp >= self.overheat or temp <= self.undercool:
+            return temp
+        if is_anomaly:
+            return self.anomaly.apply_one(temp)
+        if self.budget is not None and not self.budget.charge_one(sensor_id, self.normal.epsilon):
+            return self.anomaly.apply_one(temp)
+        return self.normal.apply_one(temp)
@@ -1,95 +1,259 @@
+import argparse
+
 import pandas as pd
 import numpy as np
 from sklearn.ensemble import IsolationForest
-import matplotlib.pyplot as plt
+import matplotlib
 import matplotlib.dates as mdates
 
-# Load data
-df = pd.read_csv(
-    'temp_reading_copy.csv',
-    comment='#',
-    skip_blank_lines=True,
-    parse_dates=['timestamp']
-)
-
-# Sort by timestamp to avoid messy lines
-df.sort_values('timestamp', inplace=True)
-df.reset_index(drop=True, inplace=True)
-
-# Train IsolationForest on first 10 seconds as “quiet” period
-quiet_end = df['timestamp'].iloc[0] + pd.Timedelta(seconds=10)
-quiet_df = df[df['timestamp'] < quiet_end].copy()
-
-model = IsolationForest(contamination=0.01, random_state=42)
-model.fit(quiet_df[['temperature_C']])
-
-# Generate masked values
-masked = []
-for temp in df['temperature_C']:
-    is_anom = (model.predict([[temp]])[0] == -1)
-    if temp >= 30.0:
-        out = temp  # Keep high temps untouched
-    elif is_anom:
-        out = 25.0 + np.random.normal(0, 0.1)  # Mask anomalies
+from downsample import minmax_indices, lttb_indices
+from features import DEFAULT_SENSOR, engine_for
+from thermal_core import Processor
+
+CHUNK_ROWS  = 500_000
+BUCKET_ROWS = 50       # min/max pre-reduction per chunk (keeps every dip and spike)
+POINTS      = 4000     # final LTTB budget per line
+
+
+def plot_sample(out=None):
+    """Original vs masked for the sample trace, zoomed on the door event."""
+    import matplotlib.pyplot as plt
+
+    # Load data
+    df = pd.read_csv(
+        'temp_reading_copy.csv',
+        comment='#',
+        skip_blank_lines=True,
+        parse_dates=['timestamp']
+    )
+
+    # Sort by timestamp to avoid messy lines
+    df.sort_values('timestamp', inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    # Train IsolationForest on first 10 seconds as “quiet” period
+    quiet_end = df['timestamp'].iloc[0] + pd.Timedelta(seconds=10)
+    quiet_df = df[df['timestamp'] < quiet_end].copy()
+
+    model = IsolationForest(contamination=0.01, random_state=42)
+    model.fit(quiet_df[['temperature_C']])
+
+    # Detect anomalies on original data (one vectorized predict)
+    temps = df['temperature_C'].to_numpy()
+    anomalies = model.predict(df[['temperature_C']]) == -1
+
+    # Generate masked values
+    masked = np.where(
+        temps >= 30.0, temps,                                   # Keep high temps untouched
+        np.where(anomalies,
+                 25.0 + np.random.normal(0, 0.1, len(temps)),   # Mask anomalies
+                 temps + np.random.normal(0, 0.02, len(temps))  # Slight noise
+                 ))
+
+    # Create masked series aligned with df
+    masked_series = pd.Series(masked, index=df.index)
+
+    # Define door open window
+    door_open_start = pd.to_datetime('2025-07-24T12:00:00Z')
+    door_open_end = pd.to_datetime('2025-07-24T12:01:05Z')
+
+    # ----------------------------- PLOT -----------------------------
+    plt.figure(figsize=(12, 6), dpi=100)
+
+    # Plot original temperature
+    plt.plot(df['timestamp'], df['temperature_C'],
+             color='lightgray', linewidth=2, label='Original')
+
+    # Plot masked temperature
+    plt.plot(df['timestamp'], masked_series,
+             color='blue', linewidth=1.5, label='Masked')
+
+    # Highlight original anomalies
+    plt.scatter(df['timestamp'][anomalies],
+                df['temperature_C'][anomalies],
+                color='red', marker='x', s=80, label='Detected Dips')
+
+    # Optional: Highlight masked anomalies (can be useful)
+    # plt.scatter(df['timestamp'][anomalies],
+    #             masked_series[anomalies],
+    #             color='green', marker='o', s=40, label='Masked Anomalies')
+
+    # Shade door open interval
+    plt.axvspan(door_open_start, door_open_end,
+                color='orange', alpha=0.2, label='Door Open Window')
+
+    # Vertical lines for door event start/end
+    plt.axvline(door_open_start, color='orange', linestyle='--', alpha=0.6)
+    plt.axvline(door_open_end, color='orange', linestyle='--', alpha=0.6)
+
+    # Zoom in to region of interest (optional). Done before the 2-second
+    # ticks: over the full multi-day range they would be ~1M tick objects.
+    plt.xlim(door_open_start - pd.Timedelta(seconds=5),
+             door_open_end + pd.Timedelta(seconds=5))
+
+    # Improve x-axis: 2-second ticks and formatting
+    ax = plt.gca()
+    ax.xaxis.set_major_locator(mdates.SecondLocator(interval=2))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
+    plt.xticks(rotation=45)
+    plt.grid(True, linestyle='--', alpha=0.5)
+
+    # Labels, title, legend
+    plt.title(
+        'Original vs. Masked Temperature Readings\nRed X’s mark detected door-opening dips')
+    plt.xlabel('Time')
+    plt.ylabel('Temperature (°C)')
+    plt.legend(loc='upper right')
+    plt.tight_layout()
+    if out:
+        plt.savefig(out)
     else:
-        out = temp + np.random.normal(0, 0.02)  # Slight noise
-    masked.append(out)
-
-# Create masked series aligned with df
-masked_series = pd.Series(masked, index=df.index)
-
-# Detect anomalies on original data
-anomalies = model.predict(df[['temperature_C']]) == -1
-
-# Define door open window
-door_open_start = pd.to_datetime('2025-07-24T12:00:00Z')
-door_open_end = pd.to_datetime('2025-07-24T12:01:05Z')
-
-# ----------------------------- PLOT -----------------------------
-plt.figure(figsize=(12, 6), dpi=100)
-
-# Plot original temperature
-plt.plot(df['timestamp'], df['temperature_C'],
-         color='lightgray', linewidth=2, label='Original')
-
-# Plot masked temperature
-plt.plot(df['timestamp'], masked_series,
-         color='blue', linewidth=1.5, label='Masked')
-
-# Highlight original anomalies
-plt.scatter(df['timestamp'][anomalies],
-            df['temperature_C'][anomalies],
-            color='red', marker='x', s=80, label='Detected Dips')
-
-# Optional: Highlight masked anomalies (can be useful)
-# plt.scatter(df['timestamp'][anomalies],
-#             masked_series[anomalies],
-#             color='green', marker='o', s=40, label='Masked Anomalies')
-
-# Shade door open interval
-plt.axvspan(door_open_start, door_open_end,
-            color='orange', alpha=0.2, label='Door Open Window')
-
-# Vertical lines for door event start/end
-plt.axvline(door_open_start, color='orange', linestyle='--', alpha=0.6)
-plt.axvline(door_open_end, color='orange', linestyle='--', alpha=0.6)
-
-# Improve x-axis: 2-second ticks and formatting
-ax = plt.gca()
-ax.xaxis.set_major_locator(mdates.SecondLocator(interval=2))
-ax.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M:%S'))
-plt.xticks(rotation=45)
-plt.grid(True, linestyle='--', alpha=0.5)
-
-# Zoom in to region of interest (optional)
-plt.xlim(door_open_start - pd.Timedelta(seconds=5),
-         door_open_end + pd.Timedelta(seconds=5))
-
-# Labels, title, legend
-plt.title(
-    'Original vs. Masked Temperature Readings\nRed X’s mark detected door-opening dips')
-plt.xlabel('Time')
-plt.ylabel('Temperature (°C)')
-plt.legend(loc='upper right')
-plt.tight_layout()
-plt.show()
+        plt.show()
+
+
+# ─── Large traces: chunked source, streaming metrics, downsampled render ───
+class DiffStats:
+    """Running MAE and std of (original - masked), merged chunk by chunk."""
+
+    def __init__(self):
+        self.n = 0
+        self.abs_sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.anomalies = 0
+
+    def update(self, diff, anomalies):
+        n = len(diff)
+        if not n:
+            return
+        mean = diff.mean()
+        m2 = ((diff - mean) ** 2).sum()
+        # Chan et al. pairwise merge of mean / sum of squared deviations
+        delta = mean - self.mean
+        total = self.n + n
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.n * n / total
+        self.n = total
+        self.abs_sum += np.abs(diff).sum()
+        self.anomalies += int(anomalies.sum())
+
+    @property
+    def mae(self):
+        return self.abs_sum / self.n if self.n else float('nan')
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / self.n) if self.n else float('nan')
+
+
+def reduce_trace(path, model, sensor=None, chunk_rows=CHUNK_ROWS, bucket_rows=BUCKET_ROWS, seed=0):
+    """Stream a CSV through the processor; returns min/max-reduced series and stats.
+
+    Anomalies are kept as one marker per bucket (its lowest reading), so
+    every flagged region still shows up after downsampling. A trace is one
+    sensor: files with readings from several need `sensor`.
+    """
+    processor = Processor(model, rng=np.random.default_rng(seed), features=engine_for(model))
+    stats = DiffStats()
+    parts = {'orig': [], 'masked': [], 'anom': []}
+    sensor_id = sensor
+
+    for chunk in pd.read_csv(path, comment='#', skip_blank_lines=True, chunksize=chunk_rows):
+        if 'sensor_id' in chunk:
+            ids = chunk['sensor_id'].astype(str)
+            if sensor is not None:
+                chunk = chunk[ids == sensor]
+            else:
+                found = set(ids.unique()) | ({sensor_id} if sensor_id is not None else set())
+                if len(found) > 1:
+                    raise ValueError(f"{path} has readings from several sensors; choose one with --sensor")
+                sensor_id = found.pop() if found else None
+        if chunk.empty:
+            continue
+        t = pd.to_datetime(chunk['timestamp'], utc=True).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        temps = chunk['temperature_C'].to_numpy(float)
+        masked, anomalies = processor.process_batch(temps, sensor_id=sensor_id or DEFAULT_SENSOR)
+        stats.update(temps - masked, anomalies)
+
+        for key, y in (('orig', temps), ('masked', masked)):
+            idx = minmax_indices(y, bucket_rows)
+            parts[key].append((t[idx], y[idx]))
+        if anomalies.any():
+            flagged = np.where(anomalies, temps, np.inf)
+            pad = -len(flagged) % bucket_rows
+            rows = np.concatenate((flagged, np.full(pad, np.inf))).reshape(-1, bucket_rows)
+            idx = np.arange(0, len(rows) * bucket_rows, bucket_rows) + rows.argmin(axis=1)
+            idx = idx[np.isfinite(rows.min(axis=1))]
+            parts['anom'].append((t[idx], temps[idx]))
+
+    series = {}
+    for key, chunks in parts.items():
+        if chunks:
+            series[key] = tuple(np.concatenate(c) for c in zip(*chunks))
+        else:
+            series[key] = (np.empty(0, dtype=np.int64), np.empty(0))
+    return series, stats
+
+
+def plot_large(path, model, sensor=None, points=POINTS, out=None, **kwargs):
+    import matplotlib.pyplot as plt
+
+    series, stats = reduce_trace(path, model, sensor=sensor, **kwargs)
+    print(f"Readings: {stats.n}  anomalies: {stats.anomalies}  "
+          f"MAE: {stats.mae:.3f} °C  std(diff): {stats.std:.3f} °C")
+
+    fig, ax = plt.subplots(figsize=(14, 6), dpi=100)
+    for key, style in (('orig', dict(color='lightgray', linewidth=2, label='Original')),
+                       ('masked', dict(color='blue', linewidth=1, label='Masked'))):
+        t, y = series[key]
+        keep = lttb_indices(t, y, points)
+        ax.plot(pd.to_datetime(t[keep], utc=True), y[keep], **style)
+
+    # Already one marker per bucket; LTTB would drop flagged buckets beyond `points`
+    t, y = series['anom']
+    ax.scatter(pd.to_datetime(t, utc=True), y,
+               color='red', marker='x', s=30, label='Detected anomalies', zorder=3)
+
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(ax.xaxis.get_major_locator()))
+    ax.grid(True, linestyle='--', alpha=0.5)
+    title = 'Original vs. Masked Temperature' + (f' — {sensor}' if sensor else '')
+    ax.set_title(f"{title}\nMAE {stats.mae:.3f} °C, std(diff) {stats.std:.3f} °C, "
+                 f"{stats.anomalies} anomalies in {stats.n} readings")
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Temperature (°C)')
+    ax.legend(loc='upper right')
+    fig.tight_layout()
+    if out:
+        fig.savefig(out)
+        plt.close(fig)
+    else:
+        plt.show()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plot original vs masked temperature.')
+    parser.add_argument('--large', metavar='CSV',
+                        help='stream a large trace in chunks and render it downsampled')
+    parser.add_argument('--model', default='iforest.joblib', help='model for --large')
+    parser.add_argument('--sensor', help='only plot this sensor_id (--large)')
+    parser.add_argument('--points', type=int, default=POINTS, help='points per line after LTTB')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--out', help='write a PNG instead of opening a window (headless)')
+    args = parser.parse_args(argv)
+
+    if args.out:
+        matplotlib.use('Agg')
+    if args.large:
+        import joblib
+        try:
+            plot_large(args.large, joblib.load(args.model), sensor=args.sensor,
+                       points=args.points, out=args.out, chunk_rows=args.chunk_rows)
+        except ValueError as e:
+            parser.error(str(e))
+    else:
+        plot_sample(out=args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Per-sensor model manifest written by train_fleet.py.
+
+The manifest is a JSON file next to the versioned artifacts::
+
+    {"version": "...", "features": {"kind": "rolling", "window": 10, "alpha": 0.3},
+     "sensors": {"<sensor_id>": {"path": "<version>/<model>.joblib", "fingerprint": "...", ...}}}
+
+`ModelRegistry` loads artifacts lazily, so a processor serving a few
+sensors of a large fleet only pays for the models it actually uses.
+"""
+import json
+import os
+
+import joblib
+
+from features import FeatureEngine
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def read_manifest(path):
+    if not os.path.exists(path):
+        return {'version': None, 'features': {'kind': 'temperature'}, 'sensors': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(path, manifest):
+    """Atomically replace the manifest so readers never see a partial file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+class ModelRegistry:
+    def __init__(self, manifest_path):
+        self.root = os.path.dirname(os.path.abspath(manifest_path))
+        self.manifest = read_manifest(manifest_path)
+        self.loaded = {}
+
+    def __contains__(self, sensor_id):
+        return sensor_id in self.manifest['sensors']
+
+    def __len__(self):
+        return len(self.manifest['sensors'])
+
+    def get(self, sensor_id):
+        """Model for a sensor, or None if it has no baseline yet."""
+        entry = self.manifest['sensors'].get(sensor_id)
+        if entry is None:
+            return None
+        path = entry['path']
+        # Sensors of one cluster share an artifact; load it once
+        if path not in self.loaded:
+            self.loaded[path] = joblib.load(os.path.join(self.root, path))
+        return self.loaded[path]
+
+    def feature_engine(self):
+        """FeatureEngine matching the manifest's training features, else None."""
+        params = self.manifest.get('features', {})
+        if params.get('kind') != 'rolling':
+            return None
+        return FeatureEngine(window=params['window'], alpha=params['alpha'])
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""Soak test: run the processor and HVAC subscriber for hours and watch for drift.
+
+    python soak.py --hours 4 --rate 10 --sensors 50 --interval 60 --report soak.csv
+
+Synthetic readings (generate_fleet.py) are published at --rate through a
+broker stand-in (`LoopbackTransport`, same JSON + Fernet round trip as MQTT)
+or a real broker (--transport mqtt), into the stream processor's and the
+subscriber's own `on_reading` callbacks. Every --interval seconds it records
+RSS, the tracemalloc heap and top growing allocators, GC pauses, queue depth
+and p50/p99 latencies of each stage and end to end. After the run, growth
+since the first post-warmup sample is checked against the --max-* limits;
+the exit code is 1 if any is exceeded.
+"""
+import argparse
+import contextlib
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+INTERVAL_SECS      = 60.0
+WARMUP_SECS        = 120.0
+TOP_ALLOCATORS     = 5
+MAX_RSS_GROWTH_MB  = 64.0
+MAX_HEAP_GROWTH_MB = 32.0
+MAX_P99_RATIO      = 3.0
+MAX_GC_PAUSE_MS    = 100.0
+MAX_PENDING        = 1000
+SOURCE_CHUNK_ROWS  = 10_000
+STAGES             = ('processor', 'subscriber', 'e2e')
+
+
+def rss_mb():
+    """Resident set size; falls back to peak RSS where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def inflight(transport):
+    """Messages queued in the transport: paho's outgoing queue or the loopback deque."""
+    client = getattr(transport, 'client', None)
+    queued = getattr(client, '_out_messages', None)    # paho internals, absent on other versions
+    if queued is None:
+        queued = getattr(transport, 'queue', ())
+    return len(queued)
+
+
+class GcPauses:
+    """Collector pause times via `gc.callbacks`, drained per interval."""
+
+    def __init__(self):
+        self.started = None
+        self.pauses = []
+        gc.callbacks.append(self._callback)
+
+    def _callback(self, phase, info):
+        if phase == 'start':
+            self.started = time.perf_counter_ns()
+        elif self.started is not None:
+            self.pauses.append(time.perf_counter_ns() - self.started)
+            self.started = None
+
+    def drain(self):
+        pauses, self.pauses = self.pauses, []
+        return pauses
+
+    def close(self):
+        gc.callbacks.remove(self._callback)
+
+
+def fleet_readings(n_sensors, rate, seed=0, block_hours=1.0, chunk_rows=SOURCE_CHUNK_ROWS):
+    """Endless reading dicts, one scenario block after another."""
+    from generate_fleet import FleetScenario, to_frame
+
+    start = pd.Timestamp('2025-07-01T00:00:00Z')
+    while True:
+        scenario = FleetScenario(n_sensors=n_sensors, hours=block_hours, rate_hz=rate / n_sensors,
+                                 start=start, seed=seed)
+        for chunk in scenario.chunks(chunk_secs=chunk_rows / rate):
+            yield from to_frame(scenario, chunk).drop(columns='label').to_dict('records')
+        start += pd.Timedelta(hours=block_hours)
+        seed += 1
+
+
+class Soak:
+    """Drives both stages over one transport and samples resource use."""
+
+    def __init__(self, processor, controller, transport, source, interval=INTERVAL_SECS,
+                 warmup=WARMUP_SECS, trace_frames=1, top=TOP_ALLOCATORS, checkpointers=(None, None), log=print):
+        import stream_processor
+        import subscriber
+
+        self.sp = stream_processor
+        self.sub = subscriber
+        self.processor = processor
+        self.controller = controller
+        self.transport = transport
+        self.source = source
+        self.interval = interval
+        self.warmup = warmup
+        self.trace_frames = trace_frames
+        self.top = top
+        self.checkpointers = checkpointers
+        self.log = log
+
+        # With --transport mqtt the callbacks run on paho's network thread while
+        # publish() and sample() run on this one; the lock covers both fields
+        self.lock = threading.Lock()
+        self.latencies = {stage: [] for stage in STAGES}
+        self.pending = {}        # (sensor_id, timestamp) → publish time, until the subscriber sees it
+        self.samples = []
+        self.allocators = []
+        self.baseline = None     # tracemalloc snapshot at the end of warmup
+        self.sent = 0
+
+        transport.subscribe(stream_processor.RAW_TOPIC, self._on_raw)
+        transport.subscribe(subscriber.TOPIC, self._on_masked)
+
+    # ─── Stage callbacks ───────────────────────────────────────────────
+    def _on_raw(self, data):
+        t0 = time.perf_counter_ns()
+        self.sp.on_reading(self.processor, self.transport, data, self.checkpointers[0])
+        elapsed = time.perf_counter_ns() - t0
+        with self.lock:
+            self.latencies['processor'].append(elapsed)
+
+    def _on_masked(self, data):
+        t0 = time.perf_counter_ns()
+        self.sub.on_reading(self.controller, data, self.checkpointers[1])
+        t1 = time.perf_counter_ns()
+        with self.lock:
+            self.latencies['subscriber'].append(t1 - t0)
+            sent = self.pending.pop((data.get('sensor_id'), data['timestamp']), None)
+            if sent is not None:
+                self.latencies['e2e'].append(t1 - sent)
+
+    def publish(self, n):
+        for _ in range(n):
+            msg = next(self.source)
+            with self.lock:
+                self.pending[(msg.get('sensor_id'), msg['timestamp'])] = time.perf_counter_ns()
+            self.transport.publish(self.sp.RAW_TOPIC, msg)
+        self.sent += n
+
+    # ─── Sampling ──────────────────────────────────────────────────────
+    def sample(self, elapsed, interval_secs, sent_before, gc_pauses):
+        with self.lock:
+            latencies = self.latencies
+            self.latencies = {stage: [] for stage in STAGES}
+            pending = len(self.pending)
+        row = {'elapsed_s': round(elapsed, 1), 'messages': self.sent,
+               'rate': (self.sent - sent_before) / interval_secs if interval_secs else 0.0,
+               'rss_mb': rss_mb(), 'pending': pending, 'inflight': inflight(self.transport)}
+
+        pauses = np.array(gc_pauses.drain(), dtype=float) / 1e6
+        row['gc_collections'] = len(pauses)
+        row['gc_pause_max_ms'] = pauses.max() if len(pauses) else 0.0
+        row['gc_pause_total_ms'] = pauses.sum()
+
+        for stage in STAGES:
+            ms = np.array(latencies[stage], dtype=float) / 1e6
+            p50, p99 = np.percentile(ms, [50, 99]) if len(ms) else (np.nan, np.nan)
+            row[f'{stage}_p50_ms'], row[f'{stage}_p99_ms'] = p50, p99
+
+        row['heap_mb'] = np.nan
+        if tracemalloc.is_tracing():
+            row['heap_mb'] = tracemalloc.get_traced_memory()[0] / 2**20
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                (tracemalloc.Filter(False, tracemalloc.__file__),))
+            if self.baseline is None and elapsed >= self.warmup:
+                self.baseline = snapshot
+            elif self.baseline is not None:
+                grown = [s for s in snapshot.compare_to(self.baseline, 'lineno') if s.size_diff > 0]
+                self.allocators = [str(s) for s in grown[:self.top]]
+            gc_pauses.drain()    # collections the snapshot itself caused
+
+        self.samples.append(row)
+        self.log(f"[Soak] {elapsed:>8.0f}s msgs={self.sent} rate={row['rate']:.0f}/s "
+                 f"rss={row['rss_mb']:.1f}MB heap={row['heap_mb']:.1f}MB "
+                 f"gc={row['gc_collections']} (max {row['gc_pause_max_ms']:.1f}ms) "
+                 f"e2e p50/p99={row['e2e_p50_ms']:.3f}/{row['e2e_p99_ms']:.3f}ms "
+                 f"pending={row['pending']} inflight={row['inflight']}")
+        return row
+
+    def run(self, duration, rate=None, report=None, clock=time.monotonic):
+        """Publish at `rate` msgs/s (None: flat out) for `duration` seconds."""
+        poll = getattr(self.transport, 'poll', None)
+        gc_pauses = GcPauses()
+        # Trace from here rather than from import: snapshots then hold only
+        # runtime allocations and stay cheap enough to take between messages
+        tracing = self.trace_frames > 0 and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start(self.trace_frames)
+        start = last = clock()
+        sent_before = 0
+        try:
+            while True:
+                now = clock()
+                elapsed = now - start
+                if elapsed >= duration:
+                    break
+                due = int(elapsed * rate) + 1 - self.sent if rate else 1
+                if due > 0:
+                    self.publish(due)
+                if poll is not None:
+                    poll()
+                if now - last >= self.interval:
+                    self.sample(elapsed, now - last, sent_before, gc_pauses)
+                    if report:
+                        pd.DataFrame(self.samples).to_csv(report, index=False)
+                    # Time spent sampling is not charged to the publish schedule
+                    paused = clock() - now
+                    start += paused
+                    last, sent_before = now + paused, self.sent
+                if rate and due <= 0:
+                    time.sleep(min(max(self.sent / rate - elapsed, 0.0), 0.01))
+
+            # Let the transport drain before the final sample
+            deadline = clock() + 5.0
+            while self.pending and clock() < deadline:
+                if poll is None or not poll():
+                    time.sleep(0.01)
+            now = clock()
+            self.sample(now - start, now - last, sent_before, gc_pauses)
+            if report:
+                pd.DataFrame(self.samples).to_csv(report, index=False)
+        finally:
+            gc_pauses.close()
+            if tracing:
+                tracemalloc.stop()
+        return self.samples
+
+
+def check(samples, warmup=WARMUP_SECS, max_rss_growth_mb=MAX_RSS_GROWTH_MB,
+          max_heap_growth_mb=MAX_HEAP_GROWTH_MB, max_p99_ratio=MAX_P99_RATIO,
+          max_gc_pause_ms=MAX_GC_PAUSE_MS, max_pending=MAX_PENDING):
+    """Threshold violations between the first post-warmup sample and the last."""
+    steady = [s for s in samples if s['elapsed_s'] >= warmup] or samples[-1:]
+    if not steady:
+        return []
+    base, last = steady[0], steady[-1]
+    failures = []
+
+    growth = last['rss_mb'] - base['rss_mb']
+    if growth > max_rss_growth_mb:
+        failures.append(f"RSS grew {growth:.1f} MB (limit {max_rss_growth_mb} MB)")
+    growth = last['heap_mb'] - base['heap_mb']
+    if not np.isnan(growth) and growth > max_heap_growth_mb:
+        failures.append(f"traced heap grew {growth:.1f} MB (limit {max_heap_growth_mb} MB)")
+    for stage in STAGES:
+        p99 = [s[f'{stage}_p99_ms'] for s in steady if not np.isnan(s[f'{stage}_p99_ms'])]
+        before, after = (p99[0], p99[-1]) if p99 else (np.nan, np.nan)
+        if before > 0 and after / before > max_p99_ratio:
+            failures.append(f"{stage} p99 {before:.3f} → {after:.3f} ms (limit ×{max_p99_ratio})")
+    pause = max(s['gc_pause_max_ms'] for s in steady)
+    if pause > max_gc_pause_ms:
+        failures.append(f"GC pause {pause:.1f} ms (limit {max_gc_pause_ms} ms)")
+    if last['pending'] > max_pending:
+        failures.append(f"{last['pending']} readings never reached the subscriber (limit {max_pending})")
+    return failures
+
+
+def build_soak(args, log):
+    import joblib
+    from cryptography.fernet import Fernet
+
+    import stream_processor as sp
+    import subscriber as sub
+    from checkpoint import Checkpointer
+    from features import engine_for
+    from registry import ModelRegistry
+    from thermal_core import Processor, HvacController, SETPOINT, AMBIENT, R, C, DT
+    from transport import make_transport
+
+    registry = ModelRegistry(args.manifest) if args.manifest else None
+    features = registry.feature_engine() if registry is not None else None
+    model = joblib.load(args.model)
+    processor = Processor(model, features=features or engine_for(model), models=registry,
+                          policy=sp.build_policy(), overheat=sp.OVERHEAT_TEMP, undercool=sp.UNDERCOOL_TEMP,
+                          prolonged_secs=sp.PROLONGED_SECS)
+    controller = HvacController(setpoint=SETPOINT, ambient=AMBIENT, r=R, c=C, dt=DT, overheat=sub.OVERHEAT,
+                                cold_alert=sub.COLD_ALERT, prolonged_secs=sub.PROLONGED_SEC)
+
+    checkpointers = (None, None)
+    if args.checkpoint_dir:
+        os.makedirs(args.checkpoint_dir, exist_ok=True)
+        checkpointers = (Checkpointer(os.path.join(args.checkpoint_dir, 'processor_state.npy'), processor),
+                         Checkpointer(os.path.join(args.checkpoint_dir, 'subscriber_state.npy'), controller))
+
+    key = open(args.key_file, 'rb').read() if os.path.exists(args.key_file) else Fernet.generate_key()
+    transport = make_transport(args.transport, broker=args.broker, port=args.port, cipher=Fernet(key),
+                               name='Soak', log=log, on_error=sp.on_decrypt_error)
+    source = fleet_readings(args.sensors, args.rate or 1000.0, seed=args.seed)
+    return Soak(processor, controller, transport, source, interval=args.interval, warmup=args.warmup,
+                trace_frames=args.trace_frames, top=args.top, checkpointers=checkpointers, log=log)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hours', type=float, default=1.0)
+    parser.add_argument('--rate', type=float, default=10.0, help='readings per second (0: flat out)')
+    parser.add_argument('--sensors', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--interval', type=float, default=INTERVAL_SECS, help='seconds between samples')
+    parser.add_argument('--warmup', type=float, default=WARMUP_SECS, help='seconds before the baseline sample')
+    parser.add_argument('--transport', choices=['loopback', 'mqtt'], default='loopback')
+    parser.add_argument('--broker', default=os.getenv('MQTT_BROKER', 'localhost'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('MQTT_PORT', '1883')))
+    parser.add_argument('--key-file', default=os.getenv('FERNET_KEY_FILE', 'secret.key'),
+                        help='Fernet key (a throwaway key is used if missing)')
+    parser.add_argument('--model', default='iforest.joblib')
+    parser.add_argument('--manifest', help='per-sensor models from train_fleet.py')
+    parser.add_argument('--checkpoint-dir', help='also run the checkpointers, writing here')
+    parser.add_argument('--protected-log', default=os.devnull, help="subscriber's protected log")
+    parser.add_argument('--echo', action='store_true', help='keep stage console output')
+    parser.add_argument('--trace-frames', type=int, default=1, help='tracemalloc depth (0 disables)')
+    parser.add_argument('--top', type=int, default=TOP_ALLOCATORS, help='growing allocators to report')
+    parser.add_argument('--report', help='write samples to this CSV as they are taken')
+    parser.add_argument('--max-rss-growth-mb', type=float, default=MAX_RSS_GROWTH_MB)
+    parser.add_argument('--max-heap-growth-mb', type=float, default=MAX_HEAP_GROWTH_MB)
+    parser.add_argument('--max-p99-ratio', type=float, default=MAX_P99_RATIO)
+    parser.add_argument('--max-gc-pause-ms', type=float, default=MAX_GC_PAUSE_MS)
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING)
+    args = parser.parse_args(argv)
+
+    out = sys.stdout
+
+    def log(msg):
+        print(msg, file=out, flush=True)
+
+    import subscriber
+    devnull = open(os.devnull, 'w')
+    subscriber.setup_logging(args.protected_log, stream=out if args.echo else devnull)
+    soak = build_soak(args, log)
+    if args.transport == 'mqtt':
+        soak.transport.start()
+    quiet = contextlib.nullcontext() if args.echo else contextlib.redirect_stdout(devnull)
+    try:
+        with quiet:
+            samples = soak.run(args.hours * 3600, rate=args.rate or None, report=args.report)
+    finally:
+        soak.transport.close()
+        for logger in (subscriber.console, subscriber.protected):
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+        devnull.close()
+
+    for line in soak.allocators:
+        log(f"[Soak] grew: {line}")
+    failures = check(samples, warmup=args.warmup, max_rss_growth_mb=args.max_rss_growth_mb,
+                     max_heap_growth_mb=args.max_heap_growth_mb, max_p99_ratio=args.max_p99_ratio,
+                     max_gc_pause_ms=args.max_gc_pause_ms, max_pending=args.max_pending)
+    for failure in failures:
+        log(f"[Soak] FAIL: {failure}")
+    log(f"[Soak] {'FAILED' if failures else 'OK'} after {soak.sent} readings")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,114 +1,164 @@
 #!/usr/bin/env python3
-import json
-import numpy as np
-import pandas as pd
+import os
 import joblib
-from datetime import datetime, timedelta
 from cryptography.fernet import Fernet
-import paho.mqtt.client as mqtt
 from datadog import initialize, statsd
 
+from checkpoint import Checkpointer, exit_on_sigterm
+from features import DEFAULT_SENSOR, engine_for
+from masking import (MaskingPolicy, GaussianMechanism, LaplaceMechanism, ConstantSubstitution,
+                     PrivacyBudget, worker_rng, NORMAL_SIGMA, SENSITIVITY, DELTA)
+from registry import ModelRegistry
+from thermal_core import Processor, OVERHEAT_TEMP, UNDERCOOL_TEMP, PROLONGED_SECS
+from transport import make_transport
+
 # — Datadog setup —
 options = {
     'statsd_host': '127.0.0.1',
     'statsd_port': 8125
 }
-initialize(**options)
 
 # — Configuration —
 BROKER          = 'localhost'
 PORT            = 1883
 RAW_TOPIC       = 'dc/temperature/raw_encrypted'
 MASKED_TOPIC    = 'dc/temperature/masked_encrypted'
-OVERHEAT_TEMP   = 30.0
-UNDERCOOL_TEMP  = 21.0
-PROLONGED_SECS  = 20
+MODEL_FILE      = 'iforest.joblib'
+MODEL_MANIFEST  = os.getenv('MODEL_MANIFEST', '')   # e.g. models/manifest.json from train_fleet.py
+KEY_FILE        = 'secret.key'
+
+# — Transports: 'mqtt' for remote hops, 'shm' when the peer stage is co-located —
+RAW_TRANSPORT    = os.getenv('RAW_TRANSPORT', 'mqtt')
+MASKED_TRANSPORT = os.getenv('MASKED_TRANSPORT', 'mqtt')
+SHM_CAPACITY     = int(os.getenv('SHM_CAPACITY', '4096'))
+
+# — Masking: 'gaussian' or 'laplace' jitter on normal readings; PRIVACY_EPSILON > 0
+#   enables per-sensor budget accounting (renewed every PRIVACY_PERIOD seconds);
+#   MASK_SENSITIVITY and MASK_DELTA set what one release costs —
+MASK_MECHANISM   = os.getenv('MASK_MECHANISM', 'gaussian')
+MASK_SCALE       = float(os.getenv('MASK_SCALE', str(NORMAL_SIGMA)))
+MASK_SENSITIVITY = float(os.getenv('MASK_SENSITIVITY', str(SENSITIVITY)))
+MASK_DELTA       = float(os.getenv('MASK_DELTA', str(DELTA)))
+PRIVACY_EPSILON = float(os.getenv('PRIVACY_EPSILON', '0'))
+PRIVACY_PERIOD  = float(os.getenv('PRIVACY_PERIOD', '3600'))
+NOISE_SEED      = int(os.getenv('NOISE_SEED')) if os.getenv('NOISE_SEED') else None
+WORKER_ID       = int(os.getenv('WORKER_ID', '0'))
+
+# — Warm restart: per-sensor state snapshot ('' disables) —
+CHECKPOINT_FILE = os.getenv('PROCESSOR_CHECKPOINT_FILE', 'processor_state.npy')
+CHECKPOINT_SECS = float(os.getenv('PROCESSOR_CHECKPOINT_SECS', '5'))
+
+
+def handle_reading(processor, data):
+    """Run one decrypted reading through the processor; returns the masked payload."""
+    temp = data.get('temperature_C')
+    statsd.histogram('stream_processor.temperature', temp)
+
+    masked = processor.process(data)
+    events = processor.events
 
-# — Load model and key (files must be in the same directory) —
-model  = joblib.load('iforest.joblib')
-cipher = Fernet(open('secret.key', 'rb').read())
+    if 'anomaly' in events:
+        statsd.increment('stream_processor.anomalies_detected')
+    if 'prolonged_open' in events:
+        start = processor.door_open_start[data.get('sensor_id', DEFAULT_SENSOR)]
+        print(f"\033[93m Prolonged door open since {start.time()}\033[0m")
+        statsd.increment('stream_processor.prolonged_open_alerts')
 
-# — State for prolonged-open detection —
-door_open_start   = None
-prolonged_alerted = False
+    if 'overheat' in events:
+        print(f"\033[91m[Processor] Overheat {temp:.2f}°C – passing real value\033[0m")
+        statsd.increment('stream_processor.overheat_events')
+    elif 'undercool' in events:
+        print(f"\033[94m[Processor] Undercool {temp:.2f}°C – passing real value\033[0m")
+        statsd.increment('stream_processor.undercool_events')
+    elif masked['anomaly']:
+        print(f"[Processor] Anomaly {temp:.2f}→{masked['temperature']:.2f} (masked)")
 
-def on_connect(client, userdata, flags, rc):
-    print(f"[Processor] Connected to broker (rc={rc})")
-    client.subscribe(RAW_TOPIC)
-    print(f"[Processor] Subscribed to topic: {RAW_TOPIC}")
+    return masked
 
-def on_message(client, userdata, msg):
-    global door_open_start, prolonged_alerted
-    print(f"[Processor] Message received on {msg.topic}")
 
+def on_decrypt_error(e):
+    print(f"[Processor] Decrypt/parse error: {e}")
     statsd.increment('stream_processor.messages_received')
+    statsd.increment('stream_processor.decrypt_errors')
 
-    try:
-        payload = cipher.decrypt(msg.payload)
-        data    = json.loads(payload)
-    except Exception as e:
-        print(f"[Processor] Decrypt/parse error: {e}")
-        statsd.increment('stream_processor.decrypt_errors')
-        return
-
-    t_str = data.get('timestamp')
-    temp  = data.get('temperature_C')
-    t     = datetime.fromisoformat(t_str.replace('Z', '+00:00'))
 
-    statsd.histogram('stream_processor.temperature', temp)
+def on_reading(processor, outbound, data, checkpointer=None):
+    print(f"[Processor] Message received on {RAW_TOPIC}")
+    statsd.increment('stream_processor.messages_received')
 
-    # Anomaly detection
-#    is_anomaly = model.predict([[temp]])[0] == -1
-    is_anomaly = model.predict(pd.DataFrame([[temp]], columns=["temperature_C"]))[0] == -1
-    if is_anomaly:
-        statsd.increment('stream_processor.anomalies_detected')
+    masked = handle_reading(processor, data)
 
-    # Prolonged‐open alarm logic
-    if is_anomaly:
-        if door_open_start is None:
-            door_open_start   = t
-            prolonged_alerted = False
-        elif not prolonged_alerted and (t - door_open_start) >= timedelta(seconds=PROLONGED_SECS):
-            print(f"\033[93m Prolonged door open since {door_open_start.time()}\033[0m")
-            prolonged_alerted = True
-            statsd.increment('stream_processor.prolonged_open_alerts')
-    else:
-        door_open_start   = None
-        prolonged_alerted = False
+    # Publish masked data (the transport encrypts on MQTT hops)
+    outbound.publish(MASKED_TOPIC, masked)
+    print(f"[Processor] Published to {MASKED_TOPIC}")
+    statsd.increment('stream_processor.published')
 
-    # Mask or pass‐through, with new undercool logic
-    if temp >= OVERHEAT_TEMP:
-        out_temp = temp
-        print(f"\033[91m[Processor] Overheat {temp:.2f}°C – passing real value\033[0m")
-        statsd.increment('stream_processor.overheat_events')
+    if checkpointer is not None and checkpointer.maybe_save():
+        statsd.increment('stream_processor.checkpoints')
 
-    elif temp <= UNDERCOOL_TEMP:
-        out_temp = temp
-        print(f"\033[94m[Processor] Undercool {temp:.2f}°C – passing real value\033[0m")
-        statsd.increment('stream_processor.undercool_events')
 
-    elif is_anomaly:
-        out_temp = 25.0 + np.random.normal(0, 0.1)
-        print(f"[Processor] Anomaly {temp:.2f}→{out_temp:.2f} (masked)")
+def build_policy():
+    rng = worker_rng(NOISE_SEED, WORKER_ID)
+    if MASK_MECHANISM == 'gaussian':
+        normal = GaussianMechanism(rng, sigma=MASK_SCALE, sensitivity=MASK_SENSITIVITY, delta=MASK_DELTA)
+    elif MASK_MECHANISM == 'laplace':
+        normal = LaplaceMechanism(rng, scale=MASK_SCALE, sensitivity=MASK_SENSITIVITY)
     else:
-        out_temp = temp + np.random.normal(0, 0.02)
-
-    # Encrypt & publish masked data
-    new_payload = json.dumps({
-        'timestamp':   t_str,
-        'temperature': round(out_temp, 2),
-        'anomaly':     bool(is_anomaly)
-    }).encode()
-    client.publish(MASKED_TOPIC, cipher.encrypt(new_payload))
-    print(f"[Processor] Published to {MASKED_TOPIC}")
-    statsd.increment('stream_processor.published')
-
+        raise ValueError(f"Unknown MASK_MECHANISM: {MASK_MECHANISM!r}")
+    # A budget smaller than one release would substitute every normal reading
+    if 0 < PRIVACY_EPSILON < normal.epsilon:
+        raise ValueError(f"PRIVACY_EPSILON={PRIVACY_EPSILON:g} is below the cost of one {MASK_MECHANISM} "
+                         f"release (epsilon={normal.epsilon:.2f}); raise it or MASK_SCALE, "
+                         f"or lower MASK_SENSITIVITY")
+    budget = PrivacyBudget(PRIVACY_EPSILON, period=PRIVACY_PERIOD) if PRIVACY_EPSILON > 0 else None
+    return MaskingPolicy(normal, ConstantSubstitution(rng), overheat=OVERHEAT_TEMP,
+                         undercool=UNDERCOOL_TEMP, budget=budget)
+
+
+def build_transports():
+    """Inbound and outbound transports; one instance per kind is shared."""
+    cipher = None
+    if 'mqtt' in (RAW_TRANSPORT, MASKED_TRANSPORT):
+        cipher = Fernet(open(KEY_FILE, 'rb').read())
+    transports = {}
+    for kind in (RAW_TRANSPORT, MASKED_TRANSPORT):
+        if kind not in transports:
+            transports[kind] = make_transport(kind, capacity=SHM_CAPACITY, broker=BROKER, port=PORT,
+                                              cipher=cipher, name='Processor', on_error=on_decrypt_error)
+    return transports[RAW_TRANSPORT], transports[MASKED_TRANSPORT]
+
+
+def main():
+    initialize(**options)
+
+    # — Load model (file must be in the same directory) and per-sensor baselines —
+    model = joblib.load(MODEL_FILE)
+    registry = ModelRegistry(MODEL_MANIFEST) if MODEL_MANIFEST else None
+    features = registry.feature_engine() if registry is not None else None
+    processor = Processor(model, features=features or engine_for(model), models=registry,
+                          policy=build_policy(), overheat=OVERHEAT_TEMP, undercool=UNDERCOOL_TEMP,
+                          prolonged_secs=PROLONGED_SECS)
+    if registry is not None:
+        print(f"[Processor] Loaded manifest with {len(registry)} sensor baselines")
+
+    checkpointer = None
+    if CHECKPOINT_FILE:
+        checkpointer = Checkpointer(CHECKPOINT_FILE, processor, interval=CHECKPOINT_SECS)
+        print(f"[Processor] Restored {checkpointer.restore()} sensor states from {CHECKPOINT_FILE}")
+
+    inbound, outbound = build_transports()
+    exit_on_sigterm()
+    inbound.subscribe(RAW_TOPIC, lambda data: on_reading(processor, outbound, data, checkpointer))
+    if outbound is not inbound:
+        outbound.start()
+    try:
+        inbound.loop_forever()
+    finally:
+        if checkpointer is not None:
+            checkpointer.save()
+        inbound.close()
+        outbound.close()
 
-# — MQTT Client Setup —
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
 
-print(f"[Processor] Connecting to {BROKER}:{PORT} …")
-client.connect(BROKER, PORT)
-client.loop_forever()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,12 @@
 #!/usr/bin/env python3
 import os
-import json
 import logging
-from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from cryptography.fernet import Fernet
-import paho.mqtt.client as mqtt
+
+from checkpoint import Checkpointer, exit_on_sigterm
+from thermal_core import HvacController, SETPOINT, AMBIENT, R, C, DT, OVERHEAT_TEMP, UNDERCOOL_TEMP
+from transport import make_transport
 
 # ─── Load ENV & Config ──────────────────────────────────────────────────
 load_dotenv()
@@ -14,147 +15,108 @@ BROKER        = os.getenv('MQTT_BROKER', 'localhost')
 PORT          = int(os.getenv('MQTT_PORT', '1883'))
 TOPIC         = os.getenv('MQTT_TOPIC', 'dc/temperature/masked_encrypted')
 KEY_FILE      = os.getenv('FERNET_KEY_FILE', 'secret.key')
+TRANSPORT     = os.getenv('MASKED_TRANSPORT', 'mqtt')   # 'shm' when co-located with the processor
+SHM_CAPACITY  = int(os.getenv('SHM_CAPACITY', '4096'))
+CHECKPOINT_FILE = os.getenv('SUBSCRIBER_CHECKPOINT_FILE', 'subscriber_state.npy')   # '' disables
+CHECKPOINT_SECS = float(os.getenv('SUBSCRIBER_CHECKPOINT_SECS', '5'))
 
-SETPOINT      = 25.0
-AMBIENT       = 22.0
-R             = 10.0
-C             = 5.0
-DT            = 1.0
-OVERHEAT      = 30.0
-COLD_ALERT    = 21.0
-NIGHT_START   = 22
-NIGHT_END     = 5
+OVERHEAT      = OVERHEAT_TEMP
+COLD_ALERT    = UNDERCOOL_TEMP
 PROLONGED_SEC = int(os.getenv('PROLONGED_SEC', '20'))
 
-# ─── Logging Setup ──────────────────────────────────────────────────────
-console = logging.getLogger('console')
-console.setLevel(logging.INFO)
-ch = logging.StreamHandler()
-ch.setFormatter(logging.Formatter('%(message)s'))
-console.addHandler(ch)
-
+console   = logging.getLogger('console')
 protected = logging.getLogger('protected')
-protected.setLevel(logging.DEBUG)
-fh = logging.FileHandler('protected.log', encoding='utf-8')
-fh.setFormatter(logging.Formatter(
-    '%(asctime)s | Meas=%(measured).2f | Ctrl=%(control).2f | '
-    'Model=%(model).2f | Anom=%(is_anom)s'
-))
-protected.addHandler(fh)
-
-# ─── PID Controller with anti-windup & clamp ────────────────────────────
-class PID:
-    def __init__(self, kp, ki, kd, dt, out_min=-5.0, out_max=5.0, deadband=0.5):
-        self.kp = kp
-        self.ki = ki
-        self.kd = kd
-        self.dt = dt
-        self.out_min = out_min
-        self.out_max = out_max
-        self.deadband = deadband
-        self.integral = 0.0
-        self.prev_error = 0.0
-
-    def update(self, error):
-        # Deadband: ignore small errors
-        if abs(error) < self.deadband:
-            error = 0.0
-        # Proportional term
-        p = self.kp * error
-        # Integral term with anti-windup: only integrate if not saturated
-        potential_i = self.integral + error * self.dt
-        i = self.ki * potential_i
-        # Derivative term
-        derivative = (error - self.prev_error) / self.dt
-        d = self.kd * derivative
-        # Unsaturated output
-        u = p + i + d
-        # Clamp output
-        u_clamped = max(self.out_min, min(self.out_max, u))
-        # Update integral only if not clamped
-        if self.out_min < u < self.out_max:
-            self.integral = potential_i
-        # Store for next derivative
-        self.prev_error = error
-        return u_clamped
-
-# ─── State & Init ───────────────────────────────────────────────────────
-cipher     = Fernet(open(KEY_FILE, 'rb').read())
-pid        = PID(kp=1.0, ki=0.05, kd=0.1, dt=DT)  # tuned gains
-room_temp  = None
-door_start = None
-prolonged_fired = False
-
-# ─── MQTT Callbacks ─────────────────────────────────────────────────────
-def on_connect(client, userdata, flags, rc):
-    console.info(f"[Subscriber] Connected (rc={rc}) – subscribing to {TOPIC}")
-    client.subscribe(TOPIC)
-
-def on_message(client, userdata, msg):
-    global room_temp, door_start, prolonged_fired
-
-    # Decrypt & parse
-    try:
-        data = json.loads(cipher.decrypt(msg.payload))
-    except Exception as e:
-        console.error(f"[Subscriber] Decrypt error: {e}")
-        return
-
-    t_str    = data['timestamp']
-    measured = data['temperature']
-    is_anom  = data.get('anomaly', False)
-    t        = datetime.fromisoformat(t_str.replace('Z','+00:00'))
-
-    # Initialize model state
-    if room_temp is None:
-        room_temp = measured
-
-    # PID control & thermal model
-    error   = SETPOINT - measured
-    control = pid.update(error)
-    dT      = (-(room_temp - AMBIENT)/(R*C) + control/C) * DT
-    room_temp += dT
-
-    # Resync only on normal readings
-    if (not is_anom) and (measured > COLD_ALERT) and (measured < OVERHEAT):
-        room_temp = measured
+
+
+# ─── Logging Setup ──────────────────────────────────────────────────────
+def setup_logging(protected_path='protected.log', stream=None):
+    console.setLevel(logging.INFO)
+    ch = logging.StreamHandler(stream)
+    ch.setFormatter(logging.Formatter('%(message)s'))
+    console.addHandler(ch)
+
+    protected.setLevel(logging.DEBUG)
+    fh = logging.FileHandler(protected_path, encoding='utf-8')
+    fh.setFormatter(logging.Formatter(
+        '%(asctime)s | Meas=%(measured).2f | Ctrl=%(control).2f | '
+        'Model=%(model).2f | Anom=%(is_anom)s'
+    ))
+    protected.addHandler(fh)
+
+
+def handle_reading(controller, data):
+    """Run one decrypted masked reading through the HVAC controller."""
+    result   = controller.step(data)
+    t        = result['time']
+    measured = result['measured']
+    events   = controller.events
 
     # Console: core status
-    console.info(f"{t.date()} {t.time()}  Masked={measured:.2f}°C  Model={room_temp:.2f}°C")
+    console.info(f"{t.date()} {t.time()}  Masked={measured:.2f}°C  Model={result['model']:.2f}°C")
 
     # Alerts on console
-    if measured >= OVERHEAT:
+    if 'overheat' in events:
         console.info(f"\033[91m OVERHEAT at {t.time()} – {measured:.2f}°C\033[0m")
-    elif measured <= COLD_ALERT:
+    elif 'undercool' in events:
         console.info(f"\033[96m UNDERCOOL at {t.time()} – {measured:.2f}°C (Regulating...)\033[0m")
 
-    if is_anom and (t.hour >= NIGHT_START or t.hour < NIGHT_END):
+    if 'night_door' in events:
         console.info(f"\033[93m Night‐time door event at {t.time()}\033[0m")
 
-    if is_anom:
-        if door_start is None:
-            door_start = t
-            prolonged_fired = False
-        elif not prolonged_fired and (t - door_start) >= timedelta(seconds=PROLONGED_SEC):
-            console.info(f"\033[96m Prolonged‐open since {door_start.time()}\033[0m")
-            prolonged_fired = True
-    else:
-        door_start = None
-        prolonged_fired = False
+    if 'prolonged_open' in events:
+        console.info(f"\033[96m Prolonged‐open since {controller.door_start.time()}\033[0m")
 
     # Protected log: full details
     protected.debug('', extra={
         'measured': measured,
-        'control':  control,
-        'model':    room_temp,
-        'is_anom':  is_anom
+        'control':  result['control'],
+        'model':    result['model'],
+        'is_anom':  result['is_anom']
     })
+    return result
+
+
+# ─── Transport Callbacks ────────────────────────────────────────────────
+def on_decrypt_error(e):
+    console.error(f"[Subscriber] Decrypt error: {e}")
+
+
+def on_reading(controller, data, checkpointer=None):
+    handle_reading(controller, data)
+    if checkpointer is not None:
+        checkpointer.maybe_save()
+
+
+# ─── Run Loop ──────────────────────────────────────────────────────────
+def main():
+    setup_logging()
+
+    controller = HvacController(setpoint=SETPOINT, ambient=AMBIENT, r=R, c=C, dt=DT,
+                                overheat=OVERHEAT, cold_alert=COLD_ALERT,
+                                prolonged_secs=PROLONGED_SEC)
+
+    # Warm restart: PID integral, thermal model and door state survive a deploy
+    checkpointer = None
+    if CHECKPOINT_FILE:
+        checkpointer = Checkpointer(CHECKPOINT_FILE, controller, interval=CHECKPOINT_SECS)
+        if checkpointer.restore():
+            console.info(f"[Subscriber] Restored controller state from {CHECKPOINT_FILE}")
+
+    cipher = Fernet(open(KEY_FILE, 'rb').read()) if TRANSPORT == 'mqtt' else None
+    transport = make_transport(TRANSPORT, capacity=SHM_CAPACITY, broker=BROKER, port=PORT,
+                               cipher=cipher, name='Subscriber', log=console.info,
+                               on_error=on_decrypt_error)
+    transport.subscribe(TOPIC, lambda data: on_reading(controller, data, checkpointer))
+
+    exit_on_sigterm()
+    console.info("[Subscriber] Starting HVAC loop…")
+    try:
+        transport.loop_forever()
+    finally:
+        if checkpointer is not None:
+            checkpointer.save()
+        transport.close()
 
-# ─── Run MQTT Loop ─────────────────────────────────────────────────────
-client = mqtt.Client()
-client.on_connect = on_connect
-client.on_message = on_message
-client.connect(BROKER, PORT)
 
-console.info("[Subscriber] Starting HVAC loop…")
-client.loop_forever()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Make the top-level modules importable when running `pytest testing`
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+# Dummy model for testing
+class DummyModel:
+    """IsolationForest stand-in: flags readings below `below` or listed in `anomalies`."""
+
+    def __init__(self, below=None, anomalies=()):
+        self.below = below
+        self.anomalies = list(anomalies)
+
+    def predict(self, X):
+        # X is a list/array of [temp, ...] rows
+        temps = np.asarray(X, dtype=float)[:, 0]
+        flagged = np.isin(temps, self.anomalies)
+        if self.below is not None:
+            flagged |= temps < self.below
+        return np.where(flagged, -1, 1)
+
+
+@pytest.fixture
+def dummy_model():
+    """Factory: ``dummy_model(below=23.0)`` or ``dummy_model(anomalies=[29.0])``."""
+    return DummyModel
@@ -0,0 +1,201 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+
+import numpy as np
+
+from checkpoint import Checkpointer, write_snapshot, read_snapshot
+from features import FeatureEngine
+from masking import MaskingPolicy, GaussianMechanism, ConstantSubstitution, PrivacyBudget, worker_rng
+from thermal_core import Processor, HvacController
+
+
+def reading(sensor_id, second, temp):
+    return {'sensor_id': sensor_id, 'timestamp': f'2025-07-01T12:00:{second:02d}Z', 'temperature_C': temp}
+
+
+def test_processor_warm_restart_keeps_door_and_features(tmp_path, dummy_model):
+    path = str(tmp_path / 'processor_state.npy')
+    before = Processor(dummy_model(below=23.0), features=FeatureEngine(window=5))
+    for s in range(12):
+        before.process(reading('rack-1', s, 22.0))
+        before.process(reading('rack-2', s, 25.0 + 0.1 * s))
+    Checkpointer(path, before).save()
+
+    after = Processor(dummy_model(below=23.0), features=FeatureEngine(window=5))
+    assert Checkpointer(path, after).restore() == 2
+    assert after.door_open_start == before.door_open_start
+    assert after.prolonged_alerted == before.prolonged_alerted
+
+    # The restored engine continues exactly where the old one stopped
+    for s in range(12, 25):
+        a = before.process(reading('rack-1', s, 22.0))
+        before_row = before.features.update('rack-2', 26.5)
+        b = after.process(reading('rack-1', s, 22.0))
+        after_row = after.features.update('rack-2', 26.5)
+        np.testing.assert_allclose(after_row, before_row)
+        assert before.events == after.events
+        assert a['anomaly'] == b['anomaly']
+    assert 'prolonged_open' not in after.events
+
+
+def test_controller_warm_restart_has_no_transient(tmp_path):
+    path = str(tmp_path / 'subscriber_state.npy')
+    masked = [{'timestamp': f'2025-07-01T12:00:{s:02d}Z', 'temperature': 28.0, 'anomaly': True} for s in range(20)]
+    before = HvacController()
+    for m in masked[:10]:
+        before.step(m)
+    Checkpointer(path, before).save()
+
+    after = HvacController()
+    Checkpointer(path, after).restore()
+    for m in masked[10:]:
+        assert after.step(m) == before.step(m)
+        assert after.events == before.events
+
+
+def test_missing_or_corrupt_snapshot_is_cold_start(tmp_path):
+    path = tmp_path / 'state.npy'
+    assert Checkpointer(str(path), HvacController()).restore() == 0
+    path.write_bytes(b'not a snapshot')
+    assert read_snapshot(str(path)) is None
+
+
+def test_maybe_save_respects_interval(tmp_path):
+    now = [0.0]
+    path = str(tmp_path / 'state.npy')
+    checkpointer = Checkpointer(path, HvacController(), interval=5, clock=lambda: now[0])
+    assert not checkpointer.maybe_save()
+    now[0] = 5.0
+    assert checkpointer.maybe_save()
+    checkpointer.wait()
+    assert read_snapshot(path) is not None
+
+
+def test_maybe_save_writes_off_the_calling_thread(tmp_path, monkeypatch):
+    import checkpoint
+
+    started, release, writers = threading.Event(), threading.Event(), []
+
+    def slow_write(path, snap):
+        writers.append(threading.current_thread())
+        started.set()
+        release.wait(5)
+        write_snapshot(path, snap)
+
+    monkeypatch.setattr(checkpoint, 'write_snapshot', slow_write)
+    now = [0.0]
+    path = str(tmp_path / 'state.npy')
+    controller = HvacController()
+    controller.room_temp = 24.0
+    checkpointer = Checkpointer(path, controller, interval=5, clock=lambda: now[0])
+    now[0] = 5.0
+    assert checkpointer.maybe_save()          # returns while the write is still blocked
+    assert started.wait(5) and writers[0] is not threading.current_thread()
+    now[0] = 10.0
+    assert not checkpointer.maybe_save()      # previous write still in flight
+    controller.room_temp = 26.0               # later changes don't leak into the pending snapshot
+    release.set()
+    checkpointer.wait()
+    assert read_snapshot(path)['room_temp'][0] == 24.0
+
+
+def test_write_is_atomic_replace(tmp_path):
+    path = str(tmp_path / 'state.npy')
+    write_snapshot(path, HvacController().snapshot())
+    write_snapshot(path, HvacController().snapshot())
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['state.npy']
+
+
+def test_other_engines_snapshot_starts_cold(tmp_path, dummy_model):
+    path = str(tmp_path / 'state.npy')
+    Checkpointer(path, Processor(dummy_model(below=23.0))).save()
+    controller = HvacController()
+    assert Checkpointer(path, controller).restore() == 0
+    assert controller.room_temp is None
+
+    Checkpointer(path, controller).save()
+    assert Checkpointer(path, Processor(dummy_model(below=23.0))).restore() == 0
+
+
+def test_naive_timestamps_survive_restart(tmp_path, dummy_model):
+    path = str(tmp_path / 'state.npy')
+    naive = [{'timestamp': f'2025-07-01T23:00:{s:02d}', 'temperature_C': 22.0} for s in range(30)]
+    before, controller = Processor(dummy_model(below=23.0)), HvacController()
+    for msg in naive[:5]:
+        before.process(msg)
+        controller.step({'timestamp': msg['timestamp'], 'temperature': 22.0, 'anomaly': True})
+    Checkpointer(path, before).save()
+    Checkpointer(str(tmp_path / 'hvac.npy'), controller).save()
+
+    after, restored = Processor(dummy_model(below=23.0)), HvacController()
+    Checkpointer(path, after).restore()
+    Checkpointer(str(tmp_path / 'hvac.npy'), restored).restore()
+    for msg in naive[5:]:
+        after.process(msg)
+        restored.step({'timestamp': msg['timestamp'], 'temperature': 22.0, 'anomaly': True})
+        if 'prolonged_open' in after.events:
+            break
+    assert msg['timestamp'].endswith(':20')
+    assert 'night_door' in restored.events
+
+
+SIGTERM_CHILD = """
+import sys, time
+sys.path.insert(0, {root!r})
+from checkpoint import Checkpointer, exit_on_sigterm
+from thermal_core import HvacController
+
+checkpointer = Checkpointer({path!r}, HvacController(), interval=3600)
+exit_on_sigterm()
+try:
+    print('ready', flush=True)
+    while True:
+        time.sleep(0.01)
+finally:
+    checkpointer.save()
+"""
+
+
+def test_sigterm_writes_final_snapshot(tmp_path):
+    path = str(tmp_path / 'subscriber_state.npy')
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    child = subprocess.Popen([sys.executable, '-c', SIGTERM_CHILD.format(root=root, path=path)],
+                             stdout=subprocess.PIPE, text=True)
+    assert child.stdout.readline().strip() == 'ready'
+    child.send_signal(signal.SIGTERM)
+    assert child.wait(timeout=10) == 128 + signal.SIGTERM
+    assert read_snapshot(path) is not None
+
+
+def test_privacy_budget_survives_restart(tmp_path, dummy_model):
+    path = str(tmp_path / 'state.npy')
+
+    def processor(now):
+        rng = worker_rng(1)
+        normal = GaussianMechanism(rng)
+        budget = PrivacyBudget(normal.epsilon * 3, period=3600, clock=lambda: now[0])
+        return Processor(dummy_model(below=23.0), policy=MaskingPolicy(normal, ConstantSubstitution(rng),
+                                                                       budget=budget))
+
+    clock = [100.0]
+    before = processor(clock)
+    for s in range(3):
+        before.process(reading('rack-1', s, 25.0))
+    Checkpointer(path, before).save()
+
+    # A fresh process (its own monotonic clock) still finds rack-1's budget spent
+    after = processor([5.0])
+    Checkpointer(path, after).restore()
+    assert after.budget.spent == before.budget.spent
+    assert after.budget.remaining('rack-1') < after.budget.remaining('rack-2')
+    assert not after.budget.charge_one('rack-1', after.policy.normal.epsilon)
+
+    # ... until the period, counted across the downtime, has passed
+    later = processor([5.0])
+    snap = read_snapshot(path).copy()
+    snap['budget_window'] -= 3600
+    later.restore(snap)
+    assert later.budget.spent == {}
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import minmax_indices, lttb_indices
+from plot_compare import DiffStats, plot_large, reduce_trace
+
+
+def test_minmax_keeps_every_extreme():
+    rng = np.random.default_rng(1)
+    y = rng.normal(25, 0.1, 10_007)
+    y[5003] = 19.0
+    y[9001] = 35.0
+    idx = minmax_indices(y, 100)
+    assert len(idx) <= 2 * (len(y) // 100 + 1)
+    assert 5003 in idx and 9001 in idx
+    assert np.all(np.diff(idx) > 0)
+
+
+def test_lttb_budget_and_endpoints():
+    x = np.arange(10_000, dtype=float)
+    y = np.sin(x / 500)
+    y[7000] = 5.0
+    idx = lttb_indices(x, y, 300)
+    assert len(idx) == 300
+    assert idx[0] == 0 and idx[-1] == 9_999
+    assert 7000 in idx
+    assert np.all(np.diff(idx) > 0)
+    assert len(lttb_indices(x[:10], y[:10], 300)) == 10
+
+
+def test_diff_stats_match_numpy():
+    rng = np.random.default_rng(2)
+    diff = rng.normal(0.1, 0.3, 1000)
+    stats = DiffStats()
+    for part in np.array_split(diff, 7):
+        stats.update(part, part > 0.5)
+    assert np.isclose(stats.mae, np.abs(diff).mean())
+    assert np.isclose(stats.std, diff.std())
+    assert stats.anomalies == int((diff > 0.5).sum())
+
+
+def test_reduce_trace_streams_chunks_and_keeps_anomalies(tmp_path, dummy_model):
+    n = 20_000
+    temps = np.full(n, 25.0)
+    temps[12_345] = 22.0
+    ts = pd.date_range('2025-07-01', periods=n, freq='100ms', tz='UTC').strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    path = tmp_path / 'trace.csv'
+    pd.DataFrame({'timestamp': ts, 'temperature_C': temps}).to_csv(path, index=False)
+
+    series, stats = reduce_trace(str(path), dummy_model(below=24.0), chunk_rows=3_000, bucket_rows=50)
+    assert stats.n == n and stats.anomalies == 1
+    assert len(series['orig'][0]) < n / 10
+    assert series['orig'][1].min() == 22.0
+    assert series['anom'][1].tolist() == [22.0]
+
+
+def test_plot_large_keeps_every_bucket_marker(tmp_path, dummy_model, monkeypatch):
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.axes import Axes
+
+    n = 5_000
+    temps = np.full(n, 25.0)
+    temps[::100] = 22.0                               # 50 flagged buckets, more than --points
+    ts = pd.date_range('2025-07-01', periods=n, freq='s', tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+    path = tmp_path / 'trace.csv'
+    pd.DataFrame({'timestamp': ts, 'temperature_C': temps}).to_csv(path, index=False)
+
+    plotted = []
+    scatter = Axes.scatter
+
+    def counting_scatter(self, x, y, **kwargs):
+        plotted.append(len(x))
+        return scatter(self, x, y, **kwargs)
+
+    monkeypatch.setattr(Axes, 'scatter', counting_scatter)
+    plot_large(str(path), dummy_model(below=24.0), points=10, out=str(tmp_path / 'trace.png'), bucket_rows=50)
+    assert plotted == [50]
+
+
+def test_reduce_trace_uses_rolling_features_per_sensor(tmp_path):
+    from sklearn.ensemble import IsolationForest
+    from features import FEATURE_NAMES, rolling_features
+
+    rng = np.random.default_rng(1)
+    train = 25.0 + rng.normal(0, 0.05, 500)
+    model = IsolationForest(random_state=0).fit(pd.DataFrame(rolling_features(train), columns=FEATURE_NAMES))
+    model.rolling_params_ = {'window': 10, 'alpha': 0.3}
+
+    ts = pd.date_range('2025-07-01', periods=400, freq='s', tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+    df = pd.concat([pd.DataFrame({'sensor_id': s, 'timestamp': ts,
+                                  'temperature_C': 25.0 + rng.normal(0, 0.05, 400)}) for s in ('rack-1', 'rack-2')])
+    path = tmp_path / 'fleet.csv'
+    df.sort_values('timestamp', kind='stable').to_csv(path, index=False)
+
+    with pytest.raises(ValueError, match='--sensor'):
+        reduce_trace(str(path), model, chunk_rows=128)
+    series, stats = reduce_trace(str(path), model, sensor='rack-2', chunk_rows=128)
+    assert stats.n == 400
+    single = tmp_path / 'rack-1.csv'
+    df[df['sensor_id'] == 'rack-1'].to_csv(single, index=False)
+    assert reduce_trace(str(single), model, chunk_rows=128)[1].n == 400
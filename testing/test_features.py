@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from features import RollingFeatures, FeatureEngine, rolling_features, FEATURE_NAMES
+
+
+@pytest.fixture
+def series():
+    rng = np.random.default_rng(7)
+    temps = 25.0 + rng.normal(0, 0.05, 500)
+    temps[200:260] -= np.linspace(0, 3, 60)   # door dip
+    return temps
+
+
+def test_online_matches_offline(series):
+    rf = RollingFeatures(window=10, alpha=0.3)
+    online = np.array([rf.update(t) for t in series])
+    offline = rolling_features(series, window=10, alpha=0.3)
+    assert offline.shape == (len(series), len(FEATURE_NAMES))
+    np.testing.assert_allclose(online, offline, atol=1e-9)
+
+
+def test_batch_continues_online_state(series):
+    offline = rolling_features(series, window=10, alpha=0.3)
+    rf = RollingFeatures(window=10, alpha=0.3)
+    parts = [rf.update_batch(series[:4]),
+             np.array([rf.update(t) for t in series[4:23]]),
+             rf.update_batch(series[23:300]),
+             rf.update_batch(series[300:])]
+    np.testing.assert_allclose(np.vstack(parts), offline, atol=1e-9)
+
+
+def test_known_values():
+    out = rolling_features([1.0, 2.0, 3.0, 4.0], window=3, alpha=0.5)
+    np.testing.assert_allclose(out[:, 1], [1.0, 1.5, 2.0, 3.0])
+    np.testing.assert_allclose(out[:, 2], [0.0, 0.5, np.sqrt(2 / 3), np.sqrt(2 / 3)])
+    np.testing.assert_allclose(out[:, 3], [0.0, 1.0, 1.0, 1.0])
+    np.testing.assert_allclose(out[:, 4], [1.0, 1.5, 2.25, 3.125])
+
+
+def test_dip_raises_slope_and_std(series):
+    out = rolling_features(series, window=10)
+    baseline, dip = out[100:190], out[210:260]
+    assert dip[:, 3].mean() < baseline[:, 3].min()
+    assert dip[:, 2].mean() > baseline[:, 2].mean()
+
+
+def test_engine_keeps_sensors_apart():
+    engine = FeatureEngine(window=5)
+    for t in (25.0, 25.0, 25.0):
+        engine.update('a', t)
+    row = engine.update('b', 20.0)
+    assert row[1] == 20.0 and row[2] == 0.0
+    assert engine.sensor('a').count == 3
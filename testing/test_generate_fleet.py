@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from generate_fleet import FleetScenario, LABELS, NORMAL, DOOR_OPEN, OVERHEAT, UNDERCOOL, generate, evaluate
+from registry import ModelRegistry
+from thermal_core import Processor
+from train_fleet import partition, train
+
+
+def scenario(**kwargs):
+    params = dict(n_sensors=20, hours=0.5, rate_hz=1.0, seed=7, door_per_hour=4, overheat_per_hour=2,
+                  undercool_per_hour=2, dropout_per_hour=2)
+    params.update(kwargs)
+    return FleetScenario(**params)
+
+
+def collect(s, chunk_secs):
+    keys = ('sensor', 'timestamp', 'temperature_C', 'label')
+    return {k: np.concatenate([c[k] for c in s.chunks(chunk_secs)]) for k in keys}
+
+
+def test_chunking_and_seed_are_reproducible():
+    s = scenario()
+    a = collect(s, 60)
+    # Same seed, other chunk sizes (across noise-block edges), and a second pass over one scenario
+    for other in (collect(scenario(), 60), collect(scenario(), 600), collect(scenario(), 77), collect(s, 180)):
+        for key in a:
+            np.testing.assert_array_equal(a[key], other[key])
+    assert not np.array_equal(a['temperature_C'], collect(scenario(seed=8), 60)['temperature_C'])
+
+
+def test_scenarios_shape_the_trace():
+    s = scenario()
+    rows = collect(s, 300)
+    temps, labels = rows['temperature_C'], rows['label']
+    assert set(np.unique(labels)) == {NORMAL, DOOR_OPEN, OVERHEAT, UNDERCOOL}
+    assert len(temps) < s.n_sensors * s.n_steps           # dropouts removed rows
+    assert temps[labels == OVERHEAT].max() > 30.0
+    assert temps[labels == UNDERCOOL].min() < 21.0
+    assert np.median(temps[labels == DOOR_OPEN]) < np.median(temps[labels == NORMAL]) - 1.0
+    assert abs(temps[labels == NORMAL].mean() - 25.0) < 0.2
+
+    # Clock skew: at step 0 every stamp sits off the start by its sensor's offset
+    first = scenario(dropout_per_hour=0).chunk(0, 1)
+    offset = (first['timestamp'] - s.start) / np.timedelta64(1, 's')
+    np.testing.assert_allclose(offset, s.skew_secs[first['sensor']], atol=1e-6)
+
+
+def test_generate_feeds_train_fleet(tmp_path):
+    s = scenario(n_sensors=3, hours=0.1)
+    out = tmp_path / 'gen'
+    total = generate(s, str(out), chunk_secs=120, log=lambda msg: None)
+    chunks = sorted(p for p in os.listdir(out) if p.startswith('chunk-'))
+    assert len(chunks) == 3
+    df = pd.concat(pd.read_csv(out / p) for p in chunks)
+    assert len(df) == total and set(df['label']) <= set(LABELS)
+    # A second pass (as evaluate makes) sees exactly the trace that was written
+    np.testing.assert_array_equal(df['temperature_C'], collect(s, 600)['temperature_C'])
+    assert len(pd.read_csv(out / 'sensors.csv')) == 3
+
+    data, models = tmp_path / 'data', tmp_path / 'models'
+    for p in chunks:
+        partition(str(out / p), str(data))
+    os.makedirs(models)
+    train(str(data), str(models), workers=1, log=lambda msg: None)
+    registry = ModelRegistry(str(models / 'manifest.json'))
+    result = evaluate(s, Processor(None, models=registry, features=registry.feature_engine()))
+    assert result['readings'] == total
+
+
+def test_evaluate_scores_against_labels(dummy_model):
+    result = evaluate(scenario(), Processor(dummy_model(below=24.0)))
+    assert result['readings_per_sec'] > 0
+    assert result['by_label']['door_open'] > 0.5
+    assert result['by_label']['undercool'] > 0.5
+    assert result['by_label']['normal'] < 0.01
+    assert result['precision'] > 0.9
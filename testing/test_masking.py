@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from masking import (MaskingPolicy, GaussianMechanism, LaplaceMechanism, ConstantSubstitution,
+                     PrivacyBudget, NoisePool, worker_rng)
+
+
+def test_worker_streams_are_reproducible_and_distinct():
+    a = worker_rng(7, 0).standard_normal(5)
+    assert np.array_equal(a, worker_rng(7, 0).standard_normal(5))
+    assert not np.array_equal(a, worker_rng(7, 1).standard_normal(5))
+
+
+def test_pool_refills_in_blocks_without_gaps():
+    pool = NoisePool(worker_rng(1), block=8)
+    drawn = np.concatenate([pool.take(3), [pool.next()], pool.take(6), pool.take(20)])
+    expected = worker_rng(1)
+    assert np.array_equal(drawn[:4], expected.standard_normal(8)[:4])
+    assert len(drawn) == 30
+
+
+def test_policy_matches_original_rules():
+    policy = MaskingPolicy.default(worker_rng(0))
+    temps = np.array([23.0, 22.5, 31.0, 20.0])
+    out = policy.apply(temps, [False, True, True, False])
+    assert abs(out[0] - 23.0) < 0.1
+    assert abs(out[1] - 25.0) < 0.5
+    assert out[2] == 31.0 and out[3] == 20.0
+    assert policy.apply_one(31.0, True) == 31.0
+    assert abs(policy.apply_one(22.5, True) - 25.0) < 0.5
+
+
+def test_laplace_and_clamped_substitution():
+    rng = worker_rng(3)
+    noise = LaplaceMechanism(rng, scale=0.5).apply(np.zeros(200_000))
+    assert np.mean(np.abs(noise)) == pytest.approx(0.5, rel=0.02)
+    sub = ConstantSubstitution(rng, center=25.0, sigma=5.0, low=24.0, high=26.0).apply(np.zeros(1000))
+    assert sub.min() >= 24.0 and sub.max() <= 26.0
+
+
+def test_budget_exhaustion_falls_back_to_substitution():
+    rng = worker_rng(4)
+    normal = GaussianMechanism(rng, sigma=0.02)
+    budget = PrivacyBudget(epsilon=normal.epsilon * 3)
+    policy = MaskingPolicy(normal, ConstantSubstitution(rng, sigma=0.0), budget=budget)
+    out = policy.apply(np.full(5, 23.0), np.zeros(5, bool), sensor_id='rack-1')
+    assert np.all(np.abs(out[:3] - 23.0) < 0.1)
+    assert np.all(out[3:] == 25.0)
+    assert policy.apply_one(23.0, False, 'rack-1') == 25.0
+    assert abs(policy.apply_one(23.0, False, 'rack-2') - 23.0) < 0.1
+
+
+def test_budget_renews_each_period():
+    now = [0.0]
+    budget = PrivacyBudget(epsilon=1.0, period=60, clock=lambda: now[0])
+    assert budget.charge('s', 0.4, n=5) == 2
+    assert not budget.charge_one('s', 0.4)
+    now[0] = 61.0
+    assert budget.charge_one('s', 0.4)
+
+
+@pytest.mark.parametrize('epsilon, cost', [(1.0, 0.1), (0.3, 0.1), (0.7, 0.07), (2.0, 0.5), (0.25, 0.3)])
+def test_batch_and_per_message_budgets_agree(epsilon, cost):
+    batch, single = PrivacyBudget(epsilon), PrivacyBudget(epsilon)
+    allowed = batch.charge('s', cost, n=50)
+    assert allowed == sum(single.charge_one('s', cost) for _ in range(50))
+    assert batch.charge('s', cost, n=1) == 0
+
+
+def test_unknown_mechanism_is_rejected(monkeypatch):
+    import stream_processor
+
+    monkeypatch.setattr(stream_processor, 'MASK_MECHANISM', 'gausian')
+    with pytest.raises(ValueError, match='gausian'):
+        stream_processor.build_policy()
+    monkeypatch.setattr(stream_processor, 'MASK_MECHANISM', 'laplace')
+    assert isinstance(stream_processor.build_policy().normal, LaplaceMechanism)
+
+
+def test_budget_below_one_release_is_rejected(monkeypatch):
+    import stream_processor
+
+    monkeypatch.setattr(stream_processor, 'PRIVACY_EPSILON', 10.0)
+    with pytest.raises(ValueError, match='PRIVACY_EPSILON'):
+        stream_processor.build_policy()
+    # A smaller sensitivity brings one release (24.2 at 0.1 °C) under the budget
+    monkeypatch.setattr(stream_processor, 'MASK_SENSITIVITY', 0.01)
+    policy = stream_processor.build_policy()
+    assert policy.normal.epsilon == pytest.approx(2.42, abs=0.01)
+    assert policy.budget.charge('s', policy.normal.epsilon, n=10) == 4
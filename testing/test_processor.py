@@ -1,61 +1,66 @@
 import pytest
 import numpy as np
-from datetime import datetime, timedelta
 from cryptography.fernet import Fernet
 
-# Make randomness deterministic for tests that use np.random.normal
-np.random.seed(42)
+from thermal_core import Processor, OVERHEAT_TEMP, PROLONGED_SECS
 
-# Dummy model for testing
-class DummyModel:
-    def __init__(self, anomalies=None):
-        self.anomalies = anomalies or []
-
-    def predict(self, X):
-        # X is a list/array of [temp] values
-        return [-1 if x[0] in self.anomalies else 1 for x in X]
 
 # — Fixtures —
 @pytest.fixture
-def dummy_model():
-    # Keep this list in sync with what your tests assert as anomalies
-    return DummyModel(anomalies=[29.0, 55.0, 100.0])
+def processor(dummy_model):
+    # Keep this list in sync with what your tests assert as anomalies; deterministic noise
+    model = dummy_model(anomalies=[22.0, 29.0, 55.0, 100.0])
+    return Processor(model, rng=np.random.default_rng(42))
+
+
+def reading(second, temp):
+    return {'timestamp': f'2025-07-24T12:00:{second:02d}Z', 'temperature_C': temp}
+
 
 # — Tests —
 
-def test_anomaly_detection(dummy_model):
+def test_anomaly_detection(processor):
     # 25.0 is normal; 29.0 is defined as anomaly in the fixture
-    assert dummy_model.predict([[25.0]])[0] == 1   # normal
-    assert dummy_model.predict([[29.0]])[0] == -1  # anomaly
-
-def test_overheat_threshold():
-    OVERHEAT_TEMP = 30.0
-    assert 32.5 >= OVERHEAT_TEMP
-    assert 25.0 < OVERHEAT_TEMP
-
-def test_temperature_masking_for_anomaly():
-    # simulate masking logic for an anomaly → around 25.0 ± 0.1σ
-    temp = 22.0
-    is_anomaly = True
-    if is_anomaly:
-        masked_temp = 25.0 + np.random.normal(0, 0.1)
-        # generous bounds to avoid flaky failures while still meaningful
-        assert 24.5 <= masked_temp <= 25.5
-
-def test_random_noise_for_normal_temp():
-    # simulate slight noise on normal data: ±0.02σ around the true temp
-    temp = 23.0
-    is_anomaly = False
-    if not is_anomaly:
-        noisy_temp = temp + np.random.normal(0, 0.02)
-        assert 22.9 <= noisy_temp <= 23.1
-
-def test_prolonged_open_detection_logic():
-    PROLONGED_SECS = 20
-    start = datetime.utcnow()
-    later = start + timedelta(seconds=25)
-    duration = (later - start).total_seconds()
-    assert duration > PROLONGED_SECS
+    assert processor.process(reading(0, 25.0))['anomaly'] is False
+    assert processor.process(reading(1, 29.0))['anomaly'] is True
+
+
+def test_overheat_threshold(processor):
+    # Readings at or above OVERHEAT_TEMP pass through unmasked, even if anomalous
+    out = processor.process(reading(0, 32.5))
+    assert out['temperature'] == 32.5 >= OVERHEAT_TEMP
+    assert 'overheat' in processor.events
+    assert processor.process(reading(1, 55.0))['temperature'] == 55.0
+    processor.process(reading(2, 25.0))
+    assert 'overheat' not in processor.events
+
+
+def test_temperature_masking_for_anomaly(processor):
+    # anomalies are replaced by 25.0 ± 0.1σ
+    out = processor.process(reading(0, 22.0))
+    assert out['anomaly'] is True
+    # generous bounds to avoid flaky failures while still meaningful
+    assert 24.5 <= out['temperature'] <= 25.5
+
+
+def test_random_noise_for_normal_temp(processor):
+    # slight noise on normal data: ±0.02σ around the true temp
+    out = processor.process(reading(0, 23.0))
+    assert out['anomaly'] is False
+    assert 22.9 <= out['temperature'] <= 23.1
+
+
+def test_prolonged_open_detection_logic(processor):
+    # A dip that lasts longer than PROLONGED_SECS raises one alert
+    fired = []
+    for s in range(PROLONGED_SECS + 6):
+        processor.process(reading(s, 22.0))
+        if 'prolonged_open' in processor.events:
+            fired.append(s)
+    assert fired == [PROLONGED_SECS]
+    processor.process(reading(PROLONGED_SECS + 6, 25.0))
+    assert processor.door_open_start == {}
+
 
 def test_encryption_decryption_cycle():
     key = Fernet.generate_key()
@@ -0,0 +1,56 @@
+import itertools
+
+import numpy as np
+
+import soak
+from thermal_core import Processor, HvacController
+from transport import LoopbackTransport
+
+
+def readings():
+    start = np.datetime64('2025-07-01T00:00:00', 'ms')
+    for i in itertools.count():
+        yield {'sensor_id': f'rack-{i % 4}', 'timestamp': f'{start + i}Z', 'temperature_C': 25.0 if i % 50 else 22.0}
+
+
+def test_soak_drives_both_stages_and_samples(capsys, dummy_model):
+    logs = []
+    run = soak.Soak(Processor(dummy_model(below=23.0)), HvacController(), LoopbackTransport(), readings(),
+                    interval=0.2, warmup=0.0, log=logs.append)
+    samples = run.run(1.0, rate=500)
+    capsys.readouterr()
+
+    assert len(samples) >= 4 and len(logs) == len(samples)
+    assert 100 <= run.sent <= 501
+    last = samples[-1]
+    assert last['pending'] == 0 and last['inflight'] == 0
+    assert all(s['e2e_p99_ms'] >= s['e2e_p50_ms'] > 0 for s in samples[:-1])
+    assert all(s['rss_mb'] > 0 and not np.isnan(s['heap_mb']) for s in samples)
+    assert soak.check(samples, warmup=0.0, max_p99_ratio=1e6) == []
+
+
+def test_check_flags_growth():
+    def sample(t, rss, heap, p99, pause=1.0, pending=0):
+        row = {'elapsed_s': t, 'rss_mb': rss, 'heap_mb': heap, 'gc_pause_max_ms': pause, 'pending': pending}
+        for stage in soak.STAGES:
+            row[f'{stage}_p99_ms'] = p99
+        return row
+
+    samples = [sample(0, 500, 1, 5.0, pause=500), sample(60, 100, 2, 1.0), sample(120, 110, 3, 1.2),
+               sample(180, 300, 80, 9.0, pending=5000)]
+    failures = soak.check(samples, warmup=60)
+    assert any('RSS grew 200.0 MB' in f for f in failures)
+    assert any('traced heap grew 78.0 MB' in f for f in failures)
+    assert sum('p99' in f for f in failures) == 3
+    assert not any('GC pause' in f for f in failures)        # the big pause was during warmup
+    assert any('5000 readings' in f for f in failures)
+    assert soak.check(samples[:3], warmup=60) == []
+
+
+def test_main_exits_nonzero_on_failure(tmp_path, capsys):
+    report = tmp_path / 'soak.csv'
+    argv = ['--hours', str(1 / 3600), '--rate', '20', '--interval', '0.5', '--warmup', '0',
+            '--trace-frames', '0', '--report', str(report)]
+    assert soak.main(argv + ['--max-rss-growth-mb', '-1']) == 1
+    assert 'FAIL: RSS grew' in capsys.readouterr().out
+    assert report.exists()
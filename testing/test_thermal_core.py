@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from features import FeatureEngine
+from thermal_core import Processor, HvacController, PID
+
+
+@pytest.fixture
+def processor(dummy_model):
+    return Processor(dummy_model(anomalies=[22.5, 29.0, 35.0]), rng=np.random.default_rng(42))
+
+
+def reading(second, temp):
+    return {'timestamp': f'2025-07-01T12:00:{second:02d}Z', 'temperature_C': temp}
+
+
+def test_normal_reading_gets_small_noise(processor):
+    out = processor.process(reading(0, 23.0))
+    assert out['anomaly'] is False
+    assert 22.9 <= out['temperature'] <= 23.1
+    assert out['timestamp'] == '2025-07-01T12:00:00Z'
+    assert processor.events == []
+
+
+def test_anomaly_is_substituted(processor):
+    out = processor.process(reading(0, 29.0))
+    assert out['anomaly'] is True
+    assert 24.5 <= out['temperature'] <= 25.5
+    assert processor.events == ['anomaly']
+
+
+def test_overheat_and_undercool_pass_through(processor):
+    assert processor.process(reading(0, 35.0))['temperature'] == 35.0
+    assert 'overheat' in processor.events
+    assert processor.process(reading(1, 20.5))['temperature'] == 20.5
+    assert processor.events == ['undercool']
+
+
+def test_prolonged_open_fires_once(processor):
+    fired = []
+    for s in range(0, 30, 5):
+        processor.process(reading(s, 22.5))
+        fired.append('prolonged_open' in processor.events)
+    assert fired == [False, False, False, False, True, False]
+    processor.process(reading(31, 24.0))
+    assert processor.door_open_start == {}
+
+
+def test_prolonged_open_is_tracked_per_sensor(processor):
+    for s in range(0, 25, 5):
+        processor.process(dict(reading(s, 22.5), sensor_id='rack-1'))
+        processor.process(dict(reading(s, 24.0), sensor_id='rack-2'))
+    assert 'rack-1' in processor.door_open_start
+    assert 'rack-2' not in processor.door_open_start
+
+
+def test_sensor_id_is_carried_through(processor):
+    assert processor.process(dict(reading(0, 23.0), sensor_id='rack-7'))['sensor_id'] == 'rack-7'
+    assert 'sensor_id' not in processor.process(reading(1, 23.0))
+
+
+def test_process_batch_matches_policy(processor):
+    temps = np.array([23.0, 29.0, 35.0, 20.0])
+    masked, anomalies = processor.process_batch(temps)
+    assert anomalies.tolist() == [False, True, True, False]
+    assert abs(masked[0] - 23.0) < 0.1
+    assert abs(masked[1] - 25.0) < 0.5
+    assert masked[2] == 35.0 and masked[3] == 20.0
+
+
+def test_feature_engine_feeds_model_rows():
+    seen = []
+
+    class RecordingModel:
+        def predict(self, X):
+            seen.append(np.asarray(X))
+            return [1] * len(X)
+
+    processor = Processor(RecordingModel(), features=FeatureEngine(window=3))
+    for s, temp in enumerate([24.0, 25.0, 26.0]):
+        processor.process(reading(s, temp))
+    assert seen[-1].shape == (1, 5)
+    assert seen[-1][0, 1] == pytest.approx(25.0)   # rolling mean
+    assert seen[-1][0, 3] == pytest.approx(1.0)    # slope per reading
+
+
+def test_pid_clamps_output():
+    pid = PID(kp=1.0, ki=0.05, kd=0.1, dt=1.0)
+    assert pid.update(100.0) == 5.0
+    assert pid.integral == 0.0
+    assert PID(kp=1.0, ki=0.05, kd=0.1, dt=1.0).update(0.2) == 0.0
+
+
+def test_hvac_resyncs_on_normal_and_flags_overheat():
+    controller = HvacController()
+    result = controller.step({'timestamp': '2025-07-01T12:00:00Z', 'temperature': 24.0, 'anomaly': False})
+    assert result['model'] == 24.0
+    result = controller.step({'timestamp': '2025-07-01T12:00:01Z', 'temperature': 31.0, 'anomaly': False})
+    assert controller.events == ['overheat']
+    assert result['control'] < 0
+
+
+def test_hvac_night_door_event():
+    controller = HvacController()
+    controller.step({'timestamp': '2025-07-01T23:00:00Z', 'temperature': 25.0, 'anomaly': True})
+    assert controller.events == ['night_door']
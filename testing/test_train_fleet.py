@@ -0,0 +1,87 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from registry import ModelRegistry
+from thermal_core import Processor
+from train_fleet import partition, discover, load_groups, train
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(3)
+    ts = pd.date_range('2025-07-01', periods=60, freq='s', tz='UTC').strftime('%Y-%m-%dT%H:%M:%SZ')
+    frames = [pd.DataFrame({'sensor_id': f'rack-{i}', 'timestamp': ts,
+                            'temperature_C': 25.0 + rng.normal(0, 0.05, len(ts))}) for i in range(3)]
+    dump = tmp_path / 'dump.csv'
+    pd.concat(frames).sort_values('timestamp', kind='stable').to_csv(dump, index=False)
+    data_dir = tmp_path / 'data'
+    assert partition(str(dump), str(data_dir), chunk_rows=50) == 3
+    return str(data_dir)
+
+
+def test_partition_is_complete_and_idempotent(dataset, tmp_path):
+    sensors = discover(dataset)
+    assert sorted(sensors) == ['rack-0', 'rack-1', 'rack-2']
+    assert len(pd.read_csv(sensors['rack-1'][0])) == 60
+    partition(str(tmp_path / 'dump.csv'), dataset, chunk_rows=50)
+    assert len(pd.read_csv(sensors['rack-1'][0])) == 60
+
+
+def test_partition_keeps_sensor_ids_as_strings(tmp_path):
+    dump = tmp_path / 'ids.csv'
+    dump.write_text('sensor_id,timestamp,temperature_C\n'
+                    '007,2025-07-01T00:00:00Z,25.0\n'
+                    '42,2025-07-01T00:00:00Z,\n'
+                    '007,2025-07-01T00:00:01Z,25.1\n')
+    partition(str(dump), str(tmp_path / 'data'), chunk_rows=2)
+    assert sorted(discover(str(tmp_path / 'data'))) == ['007', '42']
+
+    groups = tmp_path / 'groups.csv'
+    groups.write_text('sensor_id,group\n007,NA\nNA,row-1\n')
+    assert load_groups(str(groups)) == {'007': 'NA', 'NA': 'row-1'}
+
+
+def test_train_skips_unchanged_sensors(dataset, tmp_path):
+    model_dir = str(tmp_path / 'models')
+    os.makedirs(model_dir)
+    logs = []
+    first = train(dataset, model_dir, workers=2, features='rolling', log=logs.append)
+    assert set(first['sensors']) == {'rack-0', 'rack-1', 'rack-2'}
+    assert all(e['rows'] == 10 for e in first['sensors'].values())   # first 10 s only
+
+    # Appending to one partition refits only that sensor
+    path = discover(dataset)['rack-2'][0]
+    with open(path, 'a') as f:
+        f.write('2025-07-01T00:01:00Z,25.0\n')
+    os.utime(path, ns=(1, 1))
+    second = train(dataset, model_dir, workers=2, features='rolling', log=logs.append)
+    assert second['sensors']['rack-0'] == first['sensors']['rack-0']
+    assert second['sensors']['rack-2']['version'] == second['version']
+    assert '3 models, 1 to fit, 2 unchanged' in logs[-2]
+
+
+def test_manifest_serves_processor(dataset, tmp_path):
+    model_dir = str(tmp_path / 'models')
+    os.makedirs(model_dir)
+    train(dataset, model_dir, workers=1, features='rolling',
+          groups={'rack-0': 'row-a', 'rack-1': 'row-a'}, log=lambda msg: None)
+    registry = ModelRegistry(os.path.join(model_dir, 'manifest.json'))
+    assert registry.get('rack-0') is registry.get('rack-1')
+    assert registry.get('rack-9') is None
+
+    processor = Processor(None, models=registry, features=registry.feature_engine())
+    out = processor.process({'sensor_id': 'rack-2', 'timestamp': '2025-07-01T00:00:00Z', 'temperature_C': 25.0})
+    assert out['sensor_id'] == 'rack-2' and out['anomaly'] is False
+
+
+def test_group_sample_is_capped_at_max_rows(dataset, tmp_path):
+    model_dir = str(tmp_path / 'models')
+    os.makedirs(model_dir)
+    groups = {f'rack-{i}': 'row-a' for i in range(3)}
+    manifest = train(dataset, model_dir, workers=1, quiet_secs=0, max_rows=40, groups=groups,
+                     log=lambda msg: None)
+    # 3 members x 60 rows, merged into one 40-row sample rather than 3 x 40
+    assert {e['rows'] for e in manifest['sensors'].values()} == {40}
@@ -0,0 +1,181 @@
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import numpy as np
+import pytest
+
+from transport import ShmRingTransport, ShmRing, to_records, from_record, make_transport
+
+
+@pytest.fixture
+def prefix():
+    return f'dc_test_{uuid.uuid4().hex[:8]}_'
+
+
+def _producer(prefix, n):
+    tx = ShmRingTransport(capacity=8, prefix=prefix)
+    for i in range(n):
+        tx.publish('raw', {'timestamp': f'2025-07-01T12:00:{i:02d}Z', 'temperature_C': 20.0 + i})
+    tx.close()
+
+
+def test_record_round_trip():
+    raw = {'timestamp': '2025-07-01T12:00:00Z', 'temperature_C': 24.5}
+    masked = {'sensor_id': 'rack-3', 'timestamp': '2025-07-01T12:00:00Z', 'temperature': 25.02, 'anomaly': True}
+    records = to_records([raw, masked])
+    assert from_record(records[0]) == raw
+    assert from_record(records[1]) == masked
+
+
+def test_oversized_ids_are_rejected_not_truncated():
+    assert from_record(to_records([{'sensor_id': 'r' * 32, 'timestamp': 'T'}])[0])['sensor_id'] == 'r' * 32
+    with pytest.raises(ValueError, match='sensor_id'):
+        to_records([{'sensor_id': 'hall-a/row-12/rack-07/inlet-top-1', 'timestamp': 'T'}])
+    with pytest.raises(ValueError, match='timestamp'):
+        to_records([{'timestamp': '2025-07-01T12:00:00.123456789+00:00'}])
+
+
+def test_ring_wraps_and_preserves_order(prefix):
+    tx = ShmRingTransport(capacity=4, prefix=prefix)
+    received = []
+    tx.subscribe('masked', received.append)
+    for i in range(10):
+        tx.publish('masked', {'timestamp': f'T{i}', 'temperature': float(i), 'anomaly': False})
+        tx.poll()
+    tx.close()
+    assert [m['temperature'] for m in received] == [float(i) for i in range(10)]
+
+
+def test_batch_subscriber_gets_views(prefix):
+    tx = ShmRingTransport(capacity=16, prefix=prefix)
+    seen = []
+    tx.subscribe_batch('raw', lambda view: seen.append(view['temperature_C'].sum()))
+    records = to_records([{'timestamp': 'T', 'temperature_C': float(i)} for i in range(5)])
+    tx.publish_batch('raw', records)
+    assert tx.poll() == 5
+    assert seen == [10.0]
+    assert tx.poll() == 0
+    tx.close()
+
+
+def test_full_ring_times_out(prefix):
+    ring = ShmRing(prefix + 'full', capacity=2, consumer=True)
+    records = to_records([{'timestamp': 'T', 'temperature_C': 1.0}] * 3)
+    with pytest.raises(TimeoutError):
+        ring.write(records, timeout=0.01)
+    assert len(ring) == 2
+    ring.close()
+
+
+def test_cross_process_hand_off(prefix):
+    rx = ShmRingTransport(capacity=8, prefix=prefix)
+    received = []
+    rx.subscribe('raw', received.append)
+    proc = mp.get_context('spawn').Process(target=_producer, args=(prefix, 20))
+    proc.start()
+    deadline = time.monotonic() + 10
+    while len(received) < 20 and time.monotonic() < deadline:
+        rx.poll()
+    proc.join(timeout=10)
+    rx.close()
+    assert np.allclose([m['temperature_C'] for m in received], 20.0 + np.arange(20))
+
+
+def test_producer_may_start_and_exit_first(prefix):
+    proc = mp.get_context('spawn').Process(target=_producer, args=(prefix, 5))
+    proc.start()
+    proc.join(timeout=10)
+    assert proc.exitcode == 0
+
+    rx = ShmRingTransport(capacity=2, prefix=prefix)   # capacity comes from the creator's header
+    received = []
+    rx.subscribe('raw', received.append)
+    assert rx.poll() == 5
+    assert rx.rings['raw'].capacity == 8
+    rx.close()
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=prefix + 'raw')
+
+
+def test_producer_follows_restarted_consumer(prefix):
+    tx = ShmRingTransport(capacity=8, prefix=prefix)
+    first = ShmRingTransport(capacity=8, prefix=prefix)
+    received = []
+    first.subscribe('raw', received.append)
+    tx.publish('raw', {'timestamp': 'T0', 'temperature_C': 0.0})
+    first.poll()
+    first.close()
+
+    second = ShmRingTransport(capacity=8, prefix=prefix)
+    second.subscribe('raw', received.append)
+    tx.publish('raw', {'timestamp': 'T1', 'temperature_C': 1.0})
+    second.poll()
+    assert [m['timestamp'] for m in received] == ['T0', 'T1']
+    tx.close()
+    second.close()
+
+
+def test_blocked_producer_follows_restarted_consumer(prefix):
+    tx = ShmRingTransport(capacity=2, prefix=prefix)
+    first = ShmRingTransport(capacity=2, prefix=prefix)
+    first.subscribe('raw', lambda msg: None)
+    records = to_records([{'timestamp': f'T{i}', 'temperature_C': float(i)} for i in range(4)])
+    tx.publish_batch('raw', records[:2])   # ring full, nobody reading
+
+    # The consumer goes away while the producer waits for space, and comes back
+    writer = threading.Thread(target=tx.ring('raw').write, args=(records[2:],), kwargs={'timeout': 5})
+    writer.start()
+    time.sleep(0.05)
+    first.close()
+    second = ShmRingTransport(capacity=2, prefix=prefix)
+    received = []
+    second.subscribe('raw', received.append)
+    deadline = time.monotonic() + 5
+    while len(received) < 2 and time.monotonic() < deadline:
+        second.poll()
+    writer.join(timeout=5)
+    assert [m['timestamp'] for m in received] == ['T2', 'T3']
+    tx.close()
+    second.close()
+
+
+def test_consumer_close_leaves_resource_tracker_quiet(prefix):
+    # The tracker runs in its own process and reports a double unregister on stderr
+    script = (f"from transport import ShmRingTransport\n"
+              f"tx = ShmRingTransport(capacity=4, prefix={prefix!r})\n"
+              f"tx.subscribe('raw', print)\n"
+              f"tx.close()\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.run([sys.executable, '-c', script], cwd=root, capture_output=True, text=True, timeout=30)
+    assert proc.returncode == 0
+    assert 'Traceback' not in proc.stderr
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=prefix + 'raw')
+
+
+def test_unknown_transport_rejected():
+    with pytest.raises(ValueError):
+        make_transport('carrier-pigeon')
+
+
+def test_loopback_round_trip_and_decrypt_errors():
+    from cryptography.fernet import Fernet
+
+    errors = []
+    tx = make_transport('loopback', cipher=Fernet(Fernet.generate_key()), on_error=errors.append)
+    received = []
+    tx.subscribe('raw', lambda data: (received.append(data), tx.publish('masked', {'echo': data['n']})))
+    tx.subscribe('masked', received.append)
+    for n in range(3):
+        tx.publish('raw', {'n': n})
+    tx.queue.append(('raw', b'not a token'))
+    assert tx.poll() == 7          # messages published during delivery are drained too
+    assert received[:2] == [{'n': 0}, {'n': 1}]
+    assert {'echo': 2} in received and len(received) == 6
+    assert len(errors) == 1
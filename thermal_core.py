@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Processing core shared by the stream processor and the HVAC subscriber.
+
+Nothing in here touches the broker, key files, model files or log files:
+`Processor` is the anomaly + masking pipeline and `HvacController` the PID
+and thermal model, both driven with plain dicts so they can be exercised
+in-process (tests, benchmarks, embedding). The MQTT scripts are adapters.
+"""
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from features import DEFAULT_SENSOR
+from masking import MaskingPolicy, OVERHEAT_TEMP, UNDERCOOL_TEMP
+
+# — Processor defaults —
+PROLONGED_SECS  = 20
+
+# — HVAC defaults —
+SETPOINT    = 25.0
+AMBIENT     = 22.0
+R           = 10.0
+C           = 5.0
+DT          = 1.0
+NIGHT_START = 22
+NIGHT_END   = 5
+
+
+def parse_timestamp(t):
+    """ISO string (or datetime) as an aware datetime; naive values are taken as UTC.
+
+    Keeping every timestamp aware lets state restored from a snapshot (always
+    UTC) be compared with readings that carry no offset.
+    """
+    if isinstance(t, str):
+        t = datetime.fromisoformat(t.replace('Z', '+00:00'))
+    return t if t.tzinfo is not None else t.replace(tzinfo=timezone.utc)
+
+
+# Snapshots store datetimes as epoch seconds, None as NaN
+def _to_epoch(t):
+    return np.nan if t is None else t.timestamp()
+
+
+def _from_epoch(x):
+    return None if np.isnan(x) else datetime.fromtimestamp(float(x), tz=timezone.utc)
+
+
+# ─── PID Controller with anti-windup & clamp ────────────────────────────
+class PID:
+    def __init__(self, kp, ki, kd, dt, out_min=-5.0, out_max=5.0, deadband=0.5):
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.dt = dt
+        self.out_min = out_min
+        self.out_max = out_max
+        self.deadband = deadband
+        self.integral = 0.0
+        self.prev_error = 0.0
+
+    def update(self, error):
+        # Deadband: ignore small errors
+        if abs(error) < self.deadband:
+            error = 0.0
+        # Proportional term
+        p = self.kp * error
+        # Integral term with anti-windup: only integrate if not saturated
+        potential_i = self.integral + error * self.dt
+        i = self.ki * potential_i
+        # Derivative term
+        derivative = (error - self.prev_error) / self.dt
+        d = self.kd * derivative
+        # Unsaturated output
+        u = p + i + d
+        # Clamp output
+        u_clamped = max(self.out_min, min(self.out_max, u))
+        # Update integral only if not clamped
+        if self.out_min < u < self.out_max:
+            self.integral = potential_i
+        # Store for next derivative
+        self.prev_error = error
+        return u_clamped
+
+
+# ─── Stream processing engine ───────────────────────────────────────────
+class Processor:
+    """Anomaly detection, prolonged-open tracking and privacy masking.
+
+    `process` takes a raw reading ``{'timestamp', 'temperature_C'}`` and
+    returns the masked payload ``{'timestamp', 'temperature', 'anomaly'}``;
+    an optional ``sensor_id`` is carried through. The events raised by the
+    last call are left in ``self.events``. With a `features.FeatureEngine`
+    the model is scored on per-sensor rolling features instead of the bare
+    temperature. ``models`` (e.g. a `registry.ModelRegistry`) supplies
+    per-sensor baselines; ``model`` serves sensors it does not know.
+    Masking is delegated to a `masking.MaskingPolicy`; without one the
+    original policy is built on ``rng`` (a `numpy.random.Generator`).
+    """
+
+    def __init__(self, model, rng=None, features=None, models=None, policy=None,
+                 overheat=OVERHEAT_TEMP, undercool=UNDERCOOL_TEMP, prolonged_secs=PROLONGED_SECS):
+        self.model = model
+        self.models = models
+        self.policy = policy if policy is not None else MaskingPolicy.default(rng, overheat, undercool)
+        self.features = features
+        self.overheat = overheat
+        self.undercool = undercool
+        self.prolonged = timedelta(seconds=prolonged_secs)
+        # Prolonged-open state, per sensor
+        self.door_open_start = {}
+        self.prolonged_alerted = {}
+        self.events = []
+
+    def model_for(self, sensor_id):
+        model = self.models.get(sensor_id) if self.models is not None else None
+        return model if model is not None else self.model
+
+    def predict(self, X, model=None):
+        """Boolean anomaly flags for temperatures (1-D) or feature rows (2-D)."""
+        model = model if model is not None else self.model
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X.reshape(-1, 1)
+        # A 1-D fallback model next to rolling-feature baselines: column 0 is the temperature
+        if X.shape[1] > 1 and getattr(model, 'n_features_in_', None) == 1:
+            X = X[:, :1]
+        # Models fitted on a DataFrame warn when fed bare arrays
+        columns = getattr(model, 'feature_names_in_', None)
+        if columns is not None:
+            import pandas as pd
+            X = pd.DataFrame(X, columns=list(columns))
+        return np.asarray(model.predict(X)) == -1
+
+    def mask(self, temps, anomalies, sensor_id=DEFAULT_SENSOR):
+        """Apply the masking policy to arrays of temperatures and flags."""
+        return self.policy.apply(temps, anomalies, sensor_id)
+
+    def track_door(self, is_anomaly, t, sensor_id=DEFAULT_SENSOR):
+        """Update prolonged-open state; True when the alarm fires."""
+        if not is_anomaly:
+            self.door_open_start.pop(sensor_id, None)
+            self.prolonged_alerted.pop(sensor_id, None)
+            return False
+        start = self.door_open_start.get(sensor_id)
+        if start is None:
+            self.door_open_start[sensor_id] = t
+            self.prolonged_alerted[sensor_id] = False
+        elif not self.prolonged_alerted[sensor_id] and (t - start) >= self.prolonged:
+            self.prolonged_alerted[sensor_id] = True
+            return True
+        return False
+
+    def process(self, reading):
+        t_str = reading['timestamp']
+        temp = float(reading['temperature_C'])
+        t = parse_timestamp(t_str)
+        sensor_id = reading.get('sensor_id', DEFAULT_SENSOR)
+
+        X = [[temp]] if self.features is None else [self.features.update(sensor_id, temp)]
+        is_anomaly = bool(self.predict(X, self.model_for(sensor_id))[0])
+        events = []
+        if is_anomaly:
+            events.append('anomaly')
+        if self.track_door(is_anomaly, t, sensor_id):
+            events.append('prolonged_open')
+        if temp >= self.overheat:
+            events.append('overheat')
+        elif temp <= self.undercool:
+            events.append('undercool')
+        self.events = events
+
+        out_temp = self.policy.apply_one(temp, is_anomaly, sensor_id)
+        masked = {
+            'timestamp':   t_str,
+            'temperature': round(float(out_temp), 2),
+            'anomaly':     is_anomaly
+        }
+        if 'sensor_id' in reading:
+            masked['sensor_id'] = sensor_id
+        return masked
+
+    def process_batch(self, temps, timestamps=None, sensor_id=DEFAULT_SENSOR):
+        """Vectorized `process` over an array of readings from one sensor.
+
+        Returns ``(masked, anomalies)``. Prolonged-open state is only
+        advanced when ``timestamps`` (ISO strings or datetimes) are given.
+        """
+        temps = np.asarray(temps, dtype=float)
+        X = temps if self.features is None else self.features.update_batch(sensor_id, temps)
+        anomalies = self.predict(X, self.model_for(sensor_id)) if temps.size else np.zeros(0, dtype=bool)
+        if timestamps is not None:
+            for is_anomaly, t in zip(anomalies, timestamps):
+                self.track_door(is_anomaly, parse_timestamp(t), sensor_id)
+        return np.round(self.mask(temps, anomalies, sensor_id), 2), anomalies
+
+    # ─── Checkpointing (see checkpoint.py) ───
+    def snapshot_dtype(self):
+        window = self.features.window if self.features is not None else 1
+        return np.dtype([
+            ('sensor_id',         'U64'),
+            ('door_open_start',   'f8'),
+            ('prolonged_alerted', '?'),
+            ('feat_count',        'i4'),
+            ('feat_history',      'f8', (window,)),
+            ('feat_ewma',         'f8'),
+            ('budget_spent',      'f8'),
+            ('budget_window',     'f8'),    # epoch start of the budget period, NaN without a budget
+        ])
+
+    @property
+    def budget(self):
+        return getattr(self.policy, 'budget', None)
+
+    def snapshot(self):
+        """Per-sensor state as a structured array, one record per sensor."""
+        feats = self.features.sensors if self.features is not None else {}
+        spent = self.budget.spent if self.budget is not None else {}
+        sensors = sorted(set(self.door_open_start) | set(feats) | set(spent))
+        snap = np.zeros(len(sensors), dtype=self.snapshot_dtype())
+        # Filled column-wise; per-record assignment dominates on large fleets
+        snap['sensor_id'] = sensors
+        snap['door_open_start'] = [_to_epoch(self.door_open_start.get(s)) for s in sensors]
+        snap['prolonged_alerted'] = [self.prolonged_alerted.get(s, False) for s in sensors]
+        snap['feat_ewma'] = np.nan
+        snap['budget_spent'] = [spent.get(s, 0.0) for s in sensors]
+        snap['budget_window'] = self.budget.window_epoch() if self.budget is not None else np.nan
+        for i, sensor_id in enumerate(sensors):
+            rf = feats.get(sensor_id)
+            if rf is not None and rf.ewma is not None:
+                snap['feat_count'][i] = rf.count
+                snap['feat_history'][i, :rf.count] = rf.history()
+                snap['feat_ewma'][i] = rf.ewma
+        return snap
+
+    def restore(self, snap):
+        """Load state written by `snapshot`; works on memory-mapped arrays."""
+        window = self.features.window if self.features is not None else None
+        spent = {}
+        for rec in snap:
+            sensor_id = str(rec['sensor_id'])
+            start = _from_epoch(rec['door_open_start'])
+            if start is not None:
+                self.door_open_start[sensor_id] = start
+                self.prolonged_alerted[sensor_id] = bool(rec['prolonged_alerted'])
+            # Feature windows only carry over if the window length still matches
+            count = int(rec['feat_count'])
+            if count and rec['feat_history'].shape == (window,):
+                self.features.sensor(sensor_id).load(rec['feat_history'][:count], float(rec['feat_ewma']))
+            if rec['budget_spent'] > 0:
+                spent[sensor_id] = float(rec['budget_spent'])
+        # Spent epsilon outlives the process, or a restart would hand every sensor a fresh budget
+        if self.budget is not None and len(snap) and not np.isnan(snap[0]['budget_window']):
+            self.budget.resume(spent, float(snap[0]['budget_window']))
+
+
+# ─── HVAC control engine ────────────────────────────────────────────────
+class HvacController:
+    """PID control loop over a first-order thermal model of the room.
+
+    `step` takes a masked payload ``{'timestamp', 'temperature', 'anomaly'}``
+    and returns the control decision; alerts land in ``self.events``.
+    """
+
+    def __init__(self, pid=None, setpoint=SETPOINT, ambient=AMBIENT, r=R, c=C,
+                 dt=DT, overheat=OVERHEAT_TEMP, cold_alert=UNDERCOOL_TEMP,
+                 prolonged_secs=PROLONGED_SECS):
+        self.pid = pid if pid is not None else PID(kp=1.0, ki=0.05, kd=0.1, dt=dt)  # tuned gains
+        self.setpoint = setpoint
+        self.ambient = ambient
+        self.r = r
+        self.c = c
+        self.dt = dt
+        self.overheat = overheat
+        self.cold_alert = cold_alert
+        self.prolonged = timedelta(seconds=prolonged_secs)
+        self.room_temp = None
+        self.door_start = None
+        self.prolonged_fired = False
+        self.events = []
+
+    def step(self, reading):
+        measured = float(reading['temperature'])
+        is_anom = bool(reading.get('anomaly', False))
+        t = parse_timestamp(reading['timestamp'])
+
+        # Initialize model state
+        if self.room_temp is None:
+            self.room_temp = measured
+
+        # PID control & thermal model
+        error = self.setpoint - measured
+        control = self.pid.update(error)
+        dT = (-(self.room_temp - self.ambient) / (self.r * self.c) + control / self.c) * self.dt
+        self.room_temp += dT
+
+        # Resync only on normal readings
+        if (not is_anom) and (measured > self.cold_alert) and (measured < self.overheat):
+            self.room_temp = measured
+
+        events = []
+        if measured >= self.overheat:
+            events.append('overheat')
+        elif measured <= self.cold_alert:
+            events.append('undercool')
+
+        if is_anom and (t.hour >= NIGHT_START or t.hour < NIGHT_END):
+            events.append('night_door')
+
+        if is_anom:
+            if self.door_start is None:
+                self.door_start = t
+                self.prolonged_fired = False
+            elif not self.prolonged_fired and (t - self.door_start) >= self.prolonged:
+                self.prolonged_fired = True
+                events.append('prolonged_open')
+        else:
+            self.door_start = None
+            self.prolonged_fired = False
+        self.events = events
+
+        return {
+            'time':     t,
+            'measured': measured,
+            'control':  control,
+            'model':    self.room_temp,
+            'is_anom':  is_anom
+        }
+
+    # ─── Checkpointing (see checkpoint.py) ───
+    SNAPSHOT_DTYPE = np.dtype([
+        ('room_temp',       'f8'),
+        ('integral',        'f8'),
+        ('prev_error',      'f8'),
+        ('door_start',      'f8'),
+        ('prolonged_fired', '?'),
+    ])
+
+    def snapshot_dtype(self):
+        return self.SNAPSHOT_DTYPE
+
+    def snapshot(self):
+        snap = np.zeros(1, dtype=self.SNAPSHOT_DTYPE)
+        snap['room_temp'] = np.nan if self.room_temp is None else self.room_temp
+        snap['integral'] = self.pid.integral
+        snap['prev_error'] = self.pid.prev_error
+        snap['door_start'] = _to_epoch(self.door_start)
+        snap['prolonged_fired'] = self.prolonged_fired
+        return snap
+
+    def restore(self, snap):
+        if not len(snap):
+            return
+        rec = snap[0]
+        self.room_temp = None if np.isnan(rec['room_temp']) else float(rec['room_temp'])
+        self.pid.integral = float(rec['integral'])
+        self.pid.prev_error = float(rec['prev_error'])
+        self.door_start = _from_epoch(rec['door_start'])
+        self.prolonged_fired = bool(rec['prolonged_fired'])
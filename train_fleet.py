@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""Fleet training: one IsolationForest baseline per sensor (or per cluster).
+
+    python train_fleet.py partition dump.csv data/
+    python train_fleet.py train data/ models/ --workers 8 [--features rolling] [--groups groups.csv]
+
+`partition` streams a large ``sensor_id,timestamp,temperature_C`` dump into
+``data/sensor_id=<id>/part-<dump>.csv``. `train` fits each partition in a
+process pool, reading it in chunks so memory stays bounded by ``--max-rows``
+per model, and skips sensors whose files and training parameters are
+unchanged since the last run. Artifacts go to ``models/<version>/`` and
+``models/manifest.json`` tells the stream processor (registry.py) which
+artifact serves each sensor.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+
+from features import FEATURE_NAMES, WINDOW, EWMA_ALPHA, RollingFeatures
+from registry import MANIFEST_NAME, read_manifest, write_manifest
+
+CHUNK_ROWS       = 100_000
+PARTITION_PREFIX = 'sensor_id='
+QUIET_SECS       = 10
+MAX_ROWS         = 50_000
+CONTAMINATION    = 0.01
+
+
+# ─── Partitioning ──────────────────────────────────────────────────────
+def partition(dump, out_dir, chunk_rows=CHUNK_ROWS):
+    """Split a dump into per-sensor partitions without loading it whole."""
+    part = f"part-{os.path.splitext(os.path.basename(dump))[0]}.csv"
+    written = set()
+    # Ids stay strings: '007' must not become 7 (or 7.0 in a chunk with gaps)
+    reader = pd.read_csv(dump, comment='#', skip_blank_lines=True, chunksize=chunk_rows, dtype={'sensor_id': str})
+    for chunk in reader:
+        for sensor_id, g in chunk.groupby('sensor_id', sort=False):
+            d = os.path.join(out_dir, f"{PARTITION_PREFIX}{sensor_id}")
+            os.makedirs(d, exist_ok=True)
+            path = os.path.join(d, part)
+            # Truncate on first touch so re-partitioning a dump is idempotent
+            first = path not in written
+            g.drop(columns='sensor_id').to_csv(path, mode='w' if first else 'a', header=first, index=False)
+            written.add(path)
+    return len(written)
+
+
+def discover(data_dir):
+    """{sensor_id: [csv files, in name order]} for a partitioned dataset."""
+    sensors = {}
+    for d in sorted(glob.glob(os.path.join(data_dir, f"{PARTITION_PREFIX}*"))):
+        files = sorted(glob.glob(os.path.join(d, '*.csv')))
+        if files:
+            sensors[os.path.basename(d)[len(PARTITION_PREFIX):]] = files
+    return sensors
+
+
+def fingerprint(files, params):
+    """Cheap change detector: file names, sizes and mtimes plus training params."""
+    h = hashlib.sha256(json.dumps(params, sort_keys=True).encode())
+    for path in files:
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()
+
+
+# ─── Fitting (runs in worker processes) ────────────────────────────────
+def _chunks(files):
+    for path in files:
+        for chunk in pd.read_csv(path, comment='#', skip_blank_lines=True,
+                                 usecols=['timestamp', 'temperature_C'], chunksize=CHUNK_ROWS):
+            yield pd.to_datetime(chunk['timestamp'], utc=True), chunk['temperature_C'].to_numpy(float)
+
+
+def _bottom_k(rows, keys, k):
+    """The k rows with the smallest keys (all of them if there are fewer)."""
+    if len(rows) <= k:
+        return rows, keys
+    top = np.argpartition(keys, k)[:k]
+    return rows[top], keys[top]
+
+
+def sample_sensor(files, params, rng):
+    """Training rows for one sensor, at most params['max_rows'] of them, with their sampling keys.
+
+    With ``quiet_secs`` the rows are the first quiet_secs of data (as in
+    train_model.py) and reading stops there; with 0 a uniform sample of the
+    whole history is kept (bottom-k on random keys, chunk by chunk). Every
+    row carries a uniform random key so a unit's members can be merged into
+    one sample of the same size (see `fit_unit`).
+    """
+    feats = RollingFeatures(params['window'], params['alpha']) if params['features'] == 'rolling' else None
+    max_rows = params['max_rows']
+    kept, keys = np.empty((0, len(params['columns']))), np.empty(0)
+    quiet_end = None
+
+    for ts, temps in _chunks(files):
+        X = feats.update_batch(temps) if feats is not None else temps[:, None]
+        if params['quiet_secs']:
+            if quiet_end is None:
+                quiet_end = ts.iloc[0] + pd.Timedelta(seconds=params['quiet_secs'])
+            inside = (ts < quiet_end).to_numpy()
+            kept = np.vstack((kept, X[inside]))[:max_rows]
+            if not inside[-1] or len(kept) >= max_rows:
+                break
+        else:
+            kept, keys = _bottom_k(np.vstack((kept, X)), np.concatenate((keys, rng.random(len(X)))), max_rows)
+    if params['quiet_secs']:
+        keys = rng.random(len(kept))
+    return kept, keys
+
+
+def fit_unit(unit, members, params, out_path):
+    """Fit one model on a sample of its member sensors' rows; returns the row count.
+
+    Members are merged by one bottom-k over their sampling keys, so a group
+    holds at most max_rows rows however many sensors it has.
+    """
+    rng = np.random.default_rng(params['seed'])
+    X, keys = np.empty((0, len(params['columns']))), np.empty(0)
+    for _, files in members:
+        rows, row_keys = sample_sensor(files, params, rng)
+        X, keys = _bottom_k(np.vstack((X, rows)), np.concatenate((keys, row_keys)), params['max_rows'])
+    if not len(X):
+        raise ValueError(f"no training rows for {unit}")
+
+    model = IsolationForest(contamination=params['contamination'], random_state=params['seed'])
+    model.fit(pd.DataFrame(X, columns=params['columns']))
+    if params['features'] == 'rolling':
+        model.rolling_params_ = {'window': params['window'], 'alpha': params['alpha']}
+
+    tmp = f"{out_path}.tmp"
+    joblib.dump(model, tmp)
+    os.replace(tmp, out_path)
+    return len(X)
+
+
+# ─── Driver ────────────────────────────────────────────────────────────
+def load_groups(path):
+    """{sensor_id: group} from a ``sensor_id,group`` CSV."""
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)   # an id such as 'NA' stays an id
+    return dict(zip(df['sensor_id'], df['group']))
+
+
+def train(data_dir, model_dir, workers=None, features='temperature', quiet_secs=QUIET_SECS,
+          max_rows=MAX_ROWS, contamination=CONTAMINATION, groups=None, force=False, log=print):
+    manifest_path = os.path.join(model_dir, MANIFEST_NAME)
+    previous = read_manifest(manifest_path)
+    params = {
+        'features': features,
+        'columns': FEATURE_NAMES if features == 'rolling' else ['temperature_C'],
+        'window': WINDOW,
+        'alpha': EWMA_ALPHA,
+        'quiet_secs': quiet_secs,
+        'max_rows': max_rows,
+        'contamination': contamination,
+        'seed': 42,
+    }
+
+    # Sensors sharing a group are fitted together into one artifact
+    units = {}
+    for sensor_id, files in discover(data_dir).items():
+        unit = (groups or {}).get(sensor_id, sensor_id)
+        units.setdefault(unit, []).append((sensor_id, files))
+
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    sensors, todo = {}, {}
+    for unit, members in units.items():
+        fp = fingerprint([f for _, files in members for f in files], dict(params, unit=unit))
+        old = [previous['sensors'].get(s) for s, _ in members]
+        if not force and all(e is not None and e['fingerprint'] == fp for e in old):
+            sensors.update({s: e for (s, _), e in zip(members, old)})
+        else:
+            todo[unit] = (members, fp)
+
+    log(f"[Train] {len(units)} models, {len(todo)} to fit, {len(units) - len(todo)} unchanged")
+    if not todo and set(sensors) == set(previous['sensors']):
+        return previous
+
+    os.makedirs(os.path.join(model_dir, version), exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fit_unit, unit, members, params,
+                        os.path.join(model_dir, version, f"{unit}.joblib")): unit
+            for unit, (members, fp) in todo.items()
+        }
+        for future in as_completed(futures):
+            unit = futures[future]
+            members, fp = todo[unit]
+            try:
+                rows = future.result()
+            except Exception as e:
+                # Keep serving the last good baseline for these sensors
+                log(f"[Train] {unit} failed: {e}")
+                for s, _ in members:
+                    if s in previous['sensors']:
+                        sensors[s] = previous['sensors'][s]
+                continue
+            for s, _ in members:
+                sensors[s] = {'path': f"{version}/{unit}.joblib", 'fingerprint': fp,
+                              'unit': unit, 'version': version, 'rows': rows}
+
+    manifest = {
+        'version': version,
+        'features': {'kind': features, 'window': WINDOW, 'alpha': EWMA_ALPHA},
+        'sensors': sensors,
+    }
+    write_manifest(os.path.join(model_dir, version, MANIFEST_NAME), manifest)
+    write_manifest(manifest_path, manifest)
+    log(f"[Train] wrote {manifest_path} (version {version})")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('partition', help='split a dump into per-sensor partitions')
+    p.add_argument('dump')
+    p.add_argument('data_dir')
+
+    t = sub.add_parser('train', help='fit per-sensor models and write the manifest')
+    t.add_argument('data_dir')
+    t.add_argument('model_dir')
+    t.add_argument('--workers', type=int, default=None)
+    t.add_argument('--features', choices=['temperature', 'rolling'], default='temperature')
+    t.add_argument('--quiet-secs', type=float, default=QUIET_SECS,
+                   help='train on the first N seconds per sensor; 0 samples the whole history')
+    t.add_argument('--max-rows', type=int, default=MAX_ROWS)
+    t.add_argument('--contamination', type=float, default=CONTAMINATION)
+    t.add_argument('--groups', help='CSV of sensor_id,group to fit one model per group')
+    t.add_argument('--force', action='store_true', help='refit even unchanged sensors')
+
+    args = parser.parse_args(argv)
+    if args.command == 'partition':
+        n = partition(args.dump, args.data_dir)
+        print(f"[Train] wrote {n} partitions under {args.data_dir}")
+    else:
+        os.makedirs(args.model_dir, exist_ok=True)
+        train(args.data_dir, args.model_dir, workers=args.workers, features=args.features,
+              quiet_secs=args.quiet_secs, max_rows=args.max_rows, contamination=args.contamination,
+              groups=load_groups(args.groups) if args.groups else None, force=args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,36 @@
+import os
 import pandas as pd
 from sklearn.ensemble import IsolationForest
 import joblib
 
+from features import FEATURE_NAMES, WINDOW, EWMA_ALPHA, rolling_features
+
+# 'temperature' fits the original 1-D forest; 'rolling' fits on the same
+# rolling features the stream processor computes online (features.py)
+FEATURES = os.getenv('FEATURES', 'temperature')
+
 # 1. Load the sample temperature data
-df = pd.read_csv('temp_reading.csv', parse_dates=['timestamp'])
+df = pd.read_csv('temp_reading.csv', comment='#', skip_blank_lines=True, parse_dates=['timestamp'])
+
+if FEATURES == 'rolling':
+    # Features are per sensor and computed over the full ordered trace
+    df = df.sort_values('timestamp').reset_index(drop=True)
+    groups = df.groupby('sensor_id', sort=False) if 'sensor_id' in df else [(None, df)]
+    for _, g in groups:
+        df.loc[g.index, FEATURE_NAMES] = rolling_features(g['temperature_C'].to_numpy(), WINDOW, EWMA_ALPHA)
+    columns = FEATURE_NAMES
+else:
+    columns = ['temperature_C']
+
 quiet = df[df['timestamp'] < df['timestamp'].iloc[0] +
            pd.Timedelta(seconds=10)]
 
 # 2. Train the model
 model = IsolationForest(contamination=0.01, random_state=42)
-model.fit(quiet[['temperature_C']])
+model.fit(quiet[columns])
+if FEATURES == 'rolling':
+    # Lets the processor build a matching FeatureEngine (features.engine_for)
+    model.rolling_params_ = {'window': WINDOW, 'alpha': EWMA_ALPHA}
 
 # 3. Save it
 joblib.dump(model, 'iforest.joblib')
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""Message transports between pipeline stages.
+
+`MqttTransport` is the encrypted broker hop used between hosts. When two
+stages share a host, `ShmRingTransport` hands readings over through a
+fixed-size-record ring buffer in `multiprocessing.shared_memory`, skipping
+Fernet and the TCP socket. Both deliver plain dicts to subscribers; the
+ring can also deliver zero-copy record batches via `subscribe_batch`.
+`LoopbackTransport` is an in-process broker stand-in for tests and soak
+runs.
+"""
+import collections
+import json
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+try:
+    import _posixshmem
+except ImportError:  # Windows: a segment goes away with its last handle
+    _posixshmem = None
+
+SHM_PREFIX   = 'dc_ring_'
+SHM_CAPACITY = 4096
+HEADER_BYTES = 64
+FULL_BACKOFF = (1e-5, 1e-3)   # first and longest sleep while a ring is full
+
+# One slot per reading; absent numeric fields are NaN.
+RECORD_DTYPE = np.dtype([
+    ('sensor_id',     'S32'),
+    ('timestamp',     'S32'),
+    ('temperature_C', 'f8'),
+    ('temperature',   'f8'),
+    ('anomaly',       '?'),
+])
+
+
+def _encode(field, value):
+    # numpy silently truncates oversized bytes; a clipped sensor_id would merge sensors downstream
+    raw = str(value).encode()
+    if len(raw) > RECORD_DTYPE[field].itemsize:
+        raise ValueError(f"{field} {value!r} longer than {RECORD_DTYPE[field].itemsize} bytes")
+    return raw
+
+
+def to_records(messages):
+    """Pack a list of message dicts into a structured record array.
+
+    Raises ValueError for a sensor_id or timestamp that does not fit its slot.
+    """
+    records = np.zeros(len(messages), dtype=RECORD_DTYPE)
+    records['temperature_C'] = np.nan
+    records['temperature'] = np.nan
+    for i, msg in enumerate(messages):
+        records[i]['timestamp'] = _encode('timestamp', msg['timestamp'])
+        if 'sensor_id' in msg:
+            records[i]['sensor_id'] = _encode('sensor_id', msg['sensor_id'])
+        for key in ('temperature_C', 'temperature'):
+            if key in msg:
+                records[i][key] = msg[key]
+        records[i]['anomaly'] = bool(msg.get('anomaly', False))
+    return records
+
+
+def from_record(record):
+    """Unpack one record back into the dict shape the stages exchange."""
+    msg = {'timestamp': record['timestamp'].decode()}
+    if record['sensor_id']:
+        msg['sensor_id'] = record['sensor_id'].decode()
+    for key in ('temperature_C', 'temperature'):
+        value = float(record[key])
+        if not np.isnan(value):
+            msg[key] = value
+    if np.isnan(record['temperature_C']):  # only masked readings carry the flag
+        msg['anomaly'] = bool(record['anomaly'])
+    return msg
+
+
+class Transport:
+    """Publish/subscribe interface shared by all transports."""
+
+    def publish(self, topic, message):
+        raise NotImplementedError
+
+    def publish_batch(self, topic, records):
+        for record in records:
+            self.publish(topic, from_record(record))
+
+    def subscribe(self, topic, callback):
+        raise NotImplementedError
+
+    def start(self):
+        """Begin delivering in the background (publish-only use)."""
+
+    def loop_forever(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# ─── MQTT (remote hops) ────────────────────────────────────────────────
+class MqttTransport(Transport):
+    def __init__(self, broker, port, cipher, name='Transport', log=print, on_error=None, client=None):
+        import paho.mqtt.client as mqtt
+
+        self.broker = broker
+        self.port = port
+        self.cipher = cipher
+        self.name = name
+        self.log = log
+        self.on_error = on_error
+        self.handlers = {}
+        self.connected = False
+        self.client = client if client is not None else mqtt.Client()
+        self.client.on_connect = self._on_connect
+        self.client.on_message = self._on_message
+
+    def _on_connect(self, client, userdata, flags, rc):
+        self.log(f"[{self.name}] Connected to broker (rc={rc})")
+        for topic in self.handlers:
+            client.subscribe(topic)
+            self.log(f"[{self.name}] Subscribed to topic: {topic}")
+
+    def _on_message(self, client, userdata, msg):
+        try:
+            data = json.loads(self.cipher.decrypt(msg.payload))
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+            return
+        self.handlers[msg.topic](data)
+
+    def _connect(self):
+        if not self.connected:
+            self.log(f"[{self.name}] Connecting to {self.broker}:{self.port} …")
+            self.client.connect(self.broker, self.port)
+            self.connected = True
+
+    def publish(self, topic, message):
+        self.client.publish(topic, self.cipher.encrypt(json.dumps(message).encode()))
+
+    def subscribe(self, topic, callback):
+        self.handlers[topic] = callback
+
+    def start(self):
+        self._connect()
+        self.client.loop_start()
+
+    def loop_forever(self):
+        self._connect()
+        self.client.loop_forever()
+
+    def close(self):
+        if self.connected:
+            self.client.loop_stop()
+            self.client.disconnect()
+            self.connected = False
+
+
+# ─── Shared-memory ring (co-located hops) ──────────────────────────────
+def _open(name, **kwargs):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False, **kwargs)
+    except TypeError:  # Python < 3.13 always registers with the tracker
+        shm = shared_memory.SharedMemory(name=name, **kwargs)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def _unlink(shm):
+    # SharedMemory.unlink() also unregisters from the tracker, which `_open`
+    # already did on Python < 3.13; a second unregister makes the tracker
+    # process print a KeyError traceback
+    if not getattr(shm, '_track', True):
+        shm.unlink()
+    elif _posixshmem is not None:
+        _posixshmem.shm_unlink(shm._name)
+
+
+def _attach(name, size):
+    """Create the named segment, or attach to it if a peer already did.
+
+    Neither side leaves the segment to the resource tracker, which would
+    unlink it when the creating process exits; `ShmRing.close` decides.
+    """
+    try:
+        return _open(name, create=True, size=size), True
+    except FileExistsError:
+        return _open(name), False
+
+
+class ShmRing:
+    """Single-producer / single-consumer ring of RECORD_DTYPE slots.
+
+    The header holds monotonically increasing ``head`` (records written)
+    and ``tail`` (records consumed) counters, the capacity and a closed
+    flag. The writer fills slots before bumping ``head``, so readers never
+    see torn records. Either side may create the segment; only the
+    consumer unlinks it, so a producer that starts first and exits early
+    leaves its unread readings in place. A consumer marks the ring closed
+    before unlinking, and a producer that sees the flag re-opens the name
+    to follow a restarted consumer.
+    """
+
+    def __init__(self, name, capacity=SHM_CAPACITY, consumer=False):
+        self.name = name
+        self.size = HEADER_BYTES + capacity * RECORD_DTYPE.itemsize
+        self.consumer = consumer
+        self._open()
+
+    def _open(self):
+        self.shm, created = _attach(self.name, self.size)
+        self.header = np.ndarray((4,), dtype=np.uint64, buffer=self.shm.buf)
+        if created:
+            capacity = (self.size - HEADER_BYTES) // RECORD_DTYPE.itemsize
+            self.header[:] = (0, 0, capacity, 0)
+        while not self.header[2]:  # peer created it but has not initialised yet
+            time.sleep(0.001)
+        # The creator's capacity wins; the attaching side need not match it
+        self.capacity = int(self.header[2])
+        self.slots = np.ndarray((self.capacity,), dtype=RECORD_DTYPE,
+                                buffer=self.shm.buf, offset=HEADER_BYTES)
+
+    def _release(self):
+        # Drop our numpy views before releasing the mapping
+        self.header = self.slots = None
+        self.shm.close()
+
+    def __len__(self):
+        return int(self.header[0] - self.header[1])
+
+    def write(self, records, timeout=None):
+        """Copy records into the ring, waiting for space (backpressure).
+
+        While waiting, sleeps back off from FULL_BACKOFF[0] to FULL_BACKOFF[1].
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = FULL_BACKOFF[0]
+        done = 0
+        while done < len(records):
+            if self.header[3]:  # consumer closed and unlinked this segment, maybe while we waited
+                self._release()
+                self._open()
+            head, tail = int(self.header[0]), int(self.header[1])
+            free = self.capacity - (head - tail)
+            if free == 0:
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"ring {self.shm.name} full")
+                time.sleep(delay)
+                delay = min(delay * 2, FULL_BACKOFF[1])
+                continue
+            delay = FULL_BACKOFF[0]
+            start = head % self.capacity
+            n = min(free, len(records) - done, self.capacity - start)
+            self.slots[start:start + n] = records[done:done + n]
+            self.header[0] = head + n
+            done += n
+
+    def peek(self, max_records=None):
+        """Zero-copy view of the next contiguous run of unread records."""
+        head, tail = int(self.header[0]), int(self.header[1])
+        start = tail % self.capacity
+        n = min(head - tail, self.capacity - start)
+        if max_records is not None:
+            n = min(n, max_records)
+        return self.slots[start:start + n]
+
+    def advance(self, n):
+        self.header[1] = int(self.header[1]) + n
+
+    def close(self):
+        if self.consumer:
+            self.header[3] = 1
+        self._release()
+        if self.consumer:
+            try:
+                _unlink(self.shm)
+            except FileNotFoundError:
+                pass
+
+
+class ShmRingTransport(Transport):
+    """Transport over one shared-memory ring per topic.
+
+    Each topic is a single-producer / single-consumer channel: one stage
+    publishes, one stage subscribes. The subscribing side unlinks a ring
+    on close; stages may start and restart in any order.
+    """
+
+    def __init__(self, capacity=SHM_CAPACITY, prefix=SHM_PREFIX, spin=2000, idle_sleep=0.0005):
+        self.capacity = capacity
+        self.prefix = prefix
+        self.spin = spin
+        self.idle_sleep = idle_sleep
+        self.rings = {}
+        self.handlers = {}
+        self.running = False
+
+    def ring(self, topic, consumer=False):
+        if topic not in self.rings:
+            name = self.prefix + topic.replace('/', '_')
+            self.rings[topic] = ShmRing(name, self.capacity)
+        if consumer:
+            self.rings[topic].consumer = True
+        return self.rings[topic]
+
+    def publish(self, topic, message):
+        self.ring(topic).write(to_records([message]))
+
+    def publish_batch(self, topic, records):
+        self.ring(topic).write(records)
+
+    def subscribe(self, topic, callback):
+        """Deliver each record as a message dict."""
+        self.ring(topic, consumer=True)
+        self.handlers[topic] = ('message', callback)
+
+    def subscribe_batch(self, topic, callback):
+        """Deliver runs of records as zero-copy array views.
+
+        The view is only valid until the callback returns.
+        """
+        self.ring(topic, consumer=True)
+        self.handlers[topic] = ('batch', callback)
+
+    def poll(self, max_records=None):
+        """Deliver whatever is pending on subscribed topics; returns count."""
+        delivered = 0
+        for topic, (kind, callback) in self.handlers.items():
+            ring = self.rings[topic]
+            view = ring.peek(max_records)
+            if not len(view):
+                continue
+            if kind == 'batch':
+                callback(view)
+            else:
+                for record in view:
+                    callback(from_record(record))
+            ring.advance(len(view))
+            delivered += len(view)
+        return delivered
+
+    def loop_forever(self):
+        # Busy-poll briefly after traffic for low hop latency, then back off
+        self.running = True
+        idle = 0
+        while self.running:
+            if self.poll():
+                idle = 0
+            elif idle < self.spin:
+                idle += 1
+            else:
+                time.sleep(self.idle_sleep)
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.running = False
+        for ring in self.rings.values():
+            ring.close()
+        self.rings = {}
+
+
+# ─── Loopback (in-process broker stand-in) ──────────────────────────────
+class LoopbackTransport(Transport):
+    """Queues published messages in process and delivers them on `poll`.
+
+    Payloads take the same JSON (and, with a cipher, Fernet) round trip as
+    an MQTT hop, so stages see exactly what they would behind a broker.
+    """
+
+    def __init__(self, cipher=None, on_error=None, idle_sleep=0.001):
+        self.cipher = cipher
+        self.on_error = on_error
+        self.idle_sleep = idle_sleep
+        self.queue = collections.deque()
+        self.handlers = {}
+        self.running = False
+
+    def publish(self, topic, message):
+        payload = json.dumps(message).encode()
+        if self.cipher is not None:
+            payload = self.cipher.encrypt(payload)
+        self.queue.append((topic, payload))
+
+    def subscribe(self, topic, callback):
+        self.handlers[topic] = callback
+
+    def poll(self, max_messages=None):
+        """Deliver queued messages, including ones published meanwhile; returns count."""
+        delivered = 0
+        while self.queue and (max_messages is None or delivered < max_messages):
+            topic, payload = self.queue.popleft()
+            delivered += 1
+            if topic not in self.handlers:
+                continue
+            try:
+                data = json.loads(self.cipher.decrypt(payload) if self.cipher is not None else payload)
+            except Exception as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+                continue
+            self.handlers[topic](data)
+        return delivered
+
+    def loop_forever(self):
+        self.running = True
+        while self.running:
+            if not self.poll():
+                time.sleep(self.idle_sleep)
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        self.running = False
+        self.queue.clear()
+
+
+def make_transport(kind, capacity=SHM_CAPACITY, **mqtt_kwargs):
+    """Build a transport from config: ``'mqtt'``, ``'shm'`` or ``'loopback'``."""
+    if kind == 'mqtt':
+        return MqttTransport(**mqtt_kwargs)
+    if kind == 'shm':
+        return ShmRingTransport(capacity=capacity)
+    if kind == 'loopback':
+        return LoopbackTransport(cipher=mqtt_kwargs.get('cipher'), on_error=mqtt_kwargs.get('on_error'))
+    raise ValueError(f"Unknown transport: {kind!r}")